@@ -1,13 +1,27 @@
 #!/usr/bin/env python3
 import asyncio
+import socket
 import struct
-import json
+import logging
 import ctypes
-from ctypes import c_void_p, c_char_p, c_uint32, c_uint8, c_uint64, POINTER, Structure, c_int, c_int8, byref, cast, memset, sizeof
+from base64 import b64decode
+from bisect import bisect_left
+try:
+    # orjson is optional; both accept the raw bytes read from the socket
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+from ctypes import c_void_p, c_char_p, c_uint32, c_uint8, c_uint64, POINTER, Structure, c_int, c_int8, byref, cast, memset, sizeof, py_object
+
+logger = logging.getLogger('Bridge')
 
 # Load SIL-Kit shared library
 silkit = ctypes.CDLL("/home/frank/projects/sil-kit/build/Release/libSilKit.so")
 
+# SilKit struct header versions, evaluated once at import
+FRAME_VERSION = (83 << 56) | (75 << 48) | (1 << 40) | (1 << 32) | (1 << 24)  # SK_ID_MAKE(Can, SilKit_CanFrame)
+LIFECYCLE_VERSION = (83 << 56) | (75 << 48) | (7 << 40) | (2 << 32) | (1 << 24)  # SK_ID_MAKE(Participant, SilKit_LifecycleConfiguration)
+
 # Define necessary structures and types in the correct order
 class SilKit_StructHeader(Structure):
     _fields_ = [
@@ -50,6 +64,77 @@ class SilKit_LifecycleConfiguration(Structure):
         ("operationMode", c_int8)
     ]
 
+# Define CAN frame handler callback type
+FrameHandlerType = ctypes.CFUNCTYPE(None, c_void_p, c_void_p, POINTER(SilKit_CanFrameEvent))
+
+# Define function signatures
+silkit.SilKit_ParticipantConfiguration_FromString.argtypes = [POINTER(c_void_p), c_char_p]
+silkit.SilKit_ParticipantConfiguration_FromString.restype = c_int
+
+silkit.SilKit_Participant_Create.argtypes = [POINTER(c_void_p), c_void_p, c_char_p, c_char_p]
+silkit.SilKit_Participant_Create.restype = c_int
+
+silkit.SilKit_LifecycleService_Create.argtypes = [POINTER(c_void_p), c_void_p, POINTER(SilKit_LifecycleConfiguration)]
+silkit.SilKit_LifecycleService_Create.restype = c_int
+
+silkit.SilKit_LifecycleService_StartLifecycle.argtypes = [c_void_p]
+silkit.SilKit_LifecycleService_StartLifecycle.restype = c_int
+
+silkit.SilKit_LifecycleService_Stop.argtypes = [c_void_p, c_char_p]
+silkit.SilKit_LifecycleService_Stop.restype = c_int
+
+silkit.SilKit_CanController_Create.argtypes = [POINTER(c_void_p), c_void_p, c_char_p, c_char_p]
+silkit.SilKit_CanController_Create.restype = c_int
+
+silkit.SilKit_CanController_Start.argtypes = [c_void_p]
+silkit.SilKit_CanController_Start.restype = c_int
+
+silkit.SilKit_CanController_AddFrameHandler.argtypes = [c_void_p, c_void_p, FrameHandlerType, c_uint32, POINTER(c_uint64)]
+silkit.SilKit_CanController_AddFrameHandler.restype = c_int
+
+silkit.SilKit_CanController_RemoveFrameHandler.argtypes = [c_void_p, c_uint64]
+silkit.SilKit_CanController_RemoveFrameHandler.restype = c_int
+
+silkit.SilKit_CanController_SendFrame.argtypes = [c_void_p, POINTER(CanFrame), c_void_p]
+silkit.SilKit_CanController_SendFrame.restype = c_int
+
+silkit.SilKit_Participant_Destroy.argtypes = [c_void_p]
+silkit.SilKit_Participant_Destroy.restype = c_int
+
+silkit.SilKit_ParticipantConfiguration_Destroy.argtypes = [c_void_p]
+silkit.SilKit_ParticipantConfiguration_Destroy.restype = c_int
+
+# Module-level RX callback shared by all bridges; the SilKit context pointer carries
+# the id() of the SilKitBridge that registered it, so no per-instance closure is needed
+@FrameHandlerType
+def _rx_trampoline(context, controller, frame_event):
+    if frame_event and frame_event.contents.frame:
+        ctypes.cast(context, py_object).value.handle_can_message(controller, frame_event.contents.frame.contents)
+    else:
+        logger.debug("SilKit frame handler received NULL frame")
+
+# StreamReader buffer size for client connections
+STREAM_LIMIT = 1 << 20
+
+# Maximum number of SilKit frames buffered for the TCP side before dropping
+RX_QUEUE_SIZE = 1024
+
+# Bytes a thermal client may leave unsent in its transport before it is disconnected
+CLIENT_WRITE_BUFFER_LIMIT = 256 * 1024
+
+# Thermal protocol frame header: [4 bytes CAN ID][1 byte length], network byte order
+_HDR = struct.Struct('!IB')
+
+# Big-endian decoder for the JSON length prefix
+_U32BE = struct.Struct('!I').unpack_from
+
+# Bound once so the send hot path skips the CDLL attribute lookup
+_SEND = silkit.SilKit_CanController_SendFrame
+
+# CAN FD DLC code -> payload size, and payload size (0-64) -> smallest DLC code that fits
+_DLC2SIZE = bytes((0, 1, 2, 3, 4, 5, 6, 7, 8, 12, 16, 20, 24, 32, 48, 64))
+_LEN2DLC = bytes(bisect_left(_DLC2SIZE, n) for n in range(65))
+
 class SilKitBridge:
     def __init__(self):
         # Initialize SIL-Kit
@@ -57,7 +142,7 @@ class SilKitBridge:
         self.participant_name = b"CAN_Bridge"
         self.can_channel_name = b"CAN1"
         
-        print(f"Initializing SilKit bridge with participant name: {self.participant_name.decode()}")
+        logger.info("Initializing SilKit bridge with participant name: %s", self.participant_name.decode())
         
         # Create participant configuration
         self.participant_config = c_void_p()
@@ -68,7 +153,7 @@ class SilKitBridge:
         )
         if err != 0:
             raise RuntimeError(f"Failed to create participant configuration: {err}")
-        print("Participant configuration created")
+        logger.info("Participant configuration created")
         
         # Create participant
         self.participant = c_void_p()
@@ -80,12 +165,12 @@ class SilKitBridge:
         )
         if err != 0:
             raise RuntimeError(f"Failed to create participant: {err}")
-        print("Participant created")
+        logger.info("Participant created")
         
         # Create lifecycle configuration - create first but start after controller
         lifecycle_config = SilKit_LifecycleConfiguration()
         memset(byref(lifecycle_config), 0, sizeof(lifecycle_config))
-        lifecycle_config.structHeader.version = ((83 << 56) | (75 << 48) | (7 << 40) | (2 << 32) | (1 << 24))
+        lifecycle_config.structHeader.version = LIFECYCLE_VERSION
         lifecycle_config.operationMode = 20  # SilKit_OperationMode_Autonomous
         
         # Create lifecycle service
@@ -97,7 +182,7 @@ class SilKitBridge:
         )
         if result != 0:
             raise RuntimeError(f"Failed to create lifecycle service: {result}")
-        print("Lifecycle service created (but not started yet)")
+        logger.info("Lifecycle service created (but not started yet)")
         
         # Create CAN controller
         self.can_controller = c_void_p()
@@ -109,370 +194,296 @@ class SilKitBridge:
         )
         if err != 0:
             raise RuntimeError(f"Failed to create CAN controller: {err}")
-        print(f"CAN controller created on network: {self.can_channel_name.decode()}")
+        logger.info("CAN controller created on network: %s", self.can_channel_name.decode())
         
-        # Set up CAN message handler callback for receiving
-        @ctypes.CFUNCTYPE(None, c_void_p, c_void_p, POINTER(SilKit_CanFrameEvent))
-        def can_handler(context, controller, frame_event):
-            print("DEBUG: SilKit frame handler called")
-            if frame_event and frame_event.contents.frame:
-                print(f"DEBUG: SilKit frame received - ID: 0x{frame_event.contents.frame.contents.id:x}")
-                self.handle_can_message(controller, frame_event.contents.frame.contents)
-            else:
-                print("DEBUG: SilKit frame handler received NULL frame")
-        self.can_handler = can_handler  # Keep reference to prevent garbage collection
+        # Set once the event loop is running, see start_servers
+        self._loop = None
+        self._rx_queue = None
+        self.rx_dropped = 0
         
         # Define direction mask for receiving frames - must match the can_receive_test
         SILKIT_DIRECTION_RX = 2  # SilKit_Direction_Receive=2
         
         # Add frame handler
-        self.handler_id = c_uint32()
+        self.handler_id = c_uint64()
         err = silkit.SilKit_CanController_AddFrameHandler(
             self.can_controller,
-            None,  # context
-            self.can_handler,
+            id(self),  # context, resolved back to this bridge by _rx_trampoline
+            _rx_trampoline,
             SILKIT_DIRECTION_RX,
             ctypes.byref(self.handler_id)
         )
         if err != 0:
             raise RuntimeError(f"Failed to add CAN handler: {err}")
-        print("CAN frame handler registered")
+        logger.info("CAN frame handler registered")
         
         # Start CAN controller BEFORE starting lifecycle (like in can_send_test)
-        print("Starting CAN controller...")
+        logger.info("Starting CAN controller...")
         err = silkit.SilKit_CanController_Start(self.can_controller)
         if err != 0:
             raise RuntimeError(f"Failed to start CAN controller: {err}")
-        print("CAN controller started")
+        logger.info("CAN controller started")
         
         # Now start the lifecycle service (after controller is started)
-        print("Starting lifecycle service...")
+        logger.info("Starting lifecycle service...")
         result = silkit.SilKit_LifecycleService_StartLifecycle(self.lifecycle_service)
         if result != 0:
-            print(f"Warning: Failed to start lifecycle: {result}")
+            logger.warning("Failed to start lifecycle: %s", result)
         else:
-            print("Lifecycle service started successfully")
+            logger.info("Lifecycle service started successfully")
+        
+        # Persistent TX frame and payload buffer, reused for every send.
+        # SilKit copies the frame before SendFrame returns, so one buffer is enough.
+        self._tx_frame = CanFrame()
+        memset(byref(self._tx_frame), 0, sizeof(self._tx_frame))
+        self._tx_frame.structHeader.version = FRAME_VERSION
+        self._tx_buf = (c_uint8 * 64)()
+        self._tx_frame.data.data = cast(self._tx_buf, POINTER(c_uint8))
+        self._tx_frame_ref = byref(self._tx_frame)
         
         # Create a test frame to verify CAN sending works
-        print("Sending test CAN frame to verify connectivity...")
+        logger.info("Sending test CAN frame to verify connectivity...")
         self.send_test_frame()
         
-        # TCP clients (Zephyr applications)
-        self.clients = set()
-        print("SilKit bridge initialization complete")
+        # TCP clients (Zephyr applications), split by protocol at connect time.
+        # Only thermal clients speak the raw binary format SilKit frames are forwarded in.
+        self.thermal_writers = set()
+        self.json_writers = set()
+        self._closed = False
+        logger.info("SilKit bridge initialization complete")
 
     async def start_servers(self):
+        # Frames received on the SilKit thread are queued here and forwarded on the loop
+        self._rx_queue = asyncio.Queue(maxsize=RX_QUEUE_SIZE)
+        self._loop = asyncio.get_running_loop()
+        
         # Start server for ac_control on 192.0.2.10:5000
         server1 = await asyncio.start_server(
-            self.handle_client, '127.0.0.1', 5000
+            self.handle_client, '127.0.0.1', 5000, limit=STREAM_LIMIT
         )
-        print(f"Bridge server running for ac_control on 127.0.0.1:5000")
+        logger.info("Bridge server running for ac_control on 127.0.0.1:5000")
         
         # Start server for thermal on 192.0.2.20:5000
         server2 = await asyncio.start_server(
-            self.handle_client, '192.0.2.20', 5000
+            self.handle_client, '192.0.2.20', 5000, limit=STREAM_LIMIT
         )
-        print(f"Bridge server running for HVAC on 192.0.2.20:5000")
+        logger.info("Bridge server running for HVAC on 192.0.2.20:5000")
         
-        # Run both servers concurrently
+        # Run both servers and the SilKit RX forwarder concurrently
         await asyncio.gather(
             server1.serve_forever(),
-            server2.serve_forever()
+            server2.serve_forever(),
+            self._rx_consumer()
         )
         
     async def handle_client(self, reader, writer):
         addr = writer.get_extra_info('peername')
-        print(f"New connection from {addr}")
-        self.clients.add(writer)
+        logger.info("New connection from %s", addr)
+        
+        # CAN frames are tiny: send each one immediately instead of letting Nagle batch them.
+        # A client that stops reading is capped by CLIENT_WRITE_BUFFER_LIMIT in _rx_consumer
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         
         # Check if this is the thermal client (from 192.0.2.x)
         is_thermal = addr[0].startswith('192.0.2.')
-        
-        # Store references to data buffers to prevent garbage collection
-        self.data_buffers = []
+        writers = self.thermal_writers if is_thermal else self.json_writers
+        writers.add(writer)
         
         try:
             while True:
                 if is_thermal:
                     # Raw binary protocol for thermal
                     # Read header (5 bytes: 4 for ID, 1 for length)
-                    header = await reader.read(5)
-                    if not header or len(header) < 5:
-                        print(f"Incomplete header received from {addr}, closing connection")
-                        break
-                    
-                    # Extract CAN ID (first 4 bytes)
-                    can_id = (header[0] << 24) | (header[1] << 16) | (header[2] << 8) | header[3]
+                    header = await reader.readexactly(5)
                     
-                    # Extract data length (next byte)
-                    data_len = header[4]
+                    # Extract CAN ID (first 4 bytes, network byte order) and data length (next byte)
+                    can_id, data_len = _HDR.unpack(header)
                     
                     # Read data bytes
-                    data_bytes = await reader.read(data_len)
-                    if not data_bytes or len(data_bytes) < data_len:
-                        print(f"Incomplete data received from {addr}, closing connection")
-                        break
+                    data_bytes = await reader.readexactly(data_len)
                     
-                    print(f"Received raw CAN frame from thermal - ID: 0x{can_id:x}, Length: {data_len}")
-                    
-                    # Convert to list of integers for SilKit
-                    data_array = list(data_bytes)
-                    
-                    # Create and send SilKit CAN frame directly without JSON conversion
-                    frame = CanFrame()
-                    memset(byref(frame), 0, sizeof(frame))
-                    
-                    # Initialize the struct header
-                    frame.structHeader.version = ((83 << 56) | (75 << 48) | (1 << 40) | (1 << 32) | (1 << 24))
-                    
-                    # Set frame properties
-                    frame.id = can_id
-                    frame.flags = 0
-                    frame.dlc = data_len
-                    
-                    # Create a C-compatible buffer for the data
-                    data_buffer = (c_uint8 * data_len)(*data_array)
-                    self.data_buffers.append(data_buffer)
-                    if len(self.data_buffers) > 10:
-                        self.data_buffers.pop(0)
-                    
-                    # Set data pointer and size
-                    frame.data.data = cast(data_buffer, POINTER(c_uint8))
-                    frame.data.size = data_len
-                    
-                    # Send the frame
-                    print(f"Forwarding CAN frame to SilKit - ID: 0x{can_id:x}, Length: {data_len}")
-                    err = silkit.SilKit_CanController_SendFrame(
-                        self.can_controller,
-                        byref(frame),
-                        None
-                    )
-                    
-                    if err != 0:
-                        print(f"Failed to send CAN frame to SilKit: {err}")
-                    else:
-                        print(f"Successfully sent CAN frame to SilKit - ID: 0x{can_id:x}, Length: {data_len}")
+                    logger.debug("Forwarding raw CAN frame from thermal to SilKit - ID: 0x%x, Length: %d", can_id, data_len)
+                    self.send_frame(can_id, data_bytes)
                 else:
                     # JSON protocol for other clients
                     # Read message length (4 bytes)
-                    length_bytes = await reader.read(4)
-                    if not length_bytes:
-                        break
+                    length_bytes = await reader.readexactly(4)
                         
-                    msg_length = struct.unpack('!I', length_bytes)[0]
+                    msg_length, = _U32BE(length_bytes, 0)
                     
-                    # Read message
-                    msg_bytes = await reader.read(msg_length)
-                    if not msg_bytes:
-                        break
-                        
-                    # Parse message
-                    msg = json.loads(msg_bytes.decode())
+                    # Read and parse message straight from the raw bytes
+                    msg = json_loads(await reader.readexactly(msg_length))
                     
                     # Handle message based on type
                     if msg['type'] == 'can':
-                        print(f"DEBUG: Received JSON CAN message from TCP client: ID=0x{msg['id']:x}, Data={msg.get('data', [])}")
+                        can_id = msg['id']
+                        data = msg.get('data', [])
                         
-                        # Create and initialize CAN frame - approach similar to can_send_test.c
-                        frame = CanFrame()
-                        memset(byref(frame), 0, sizeof(frame)) # Zero out the entire structure first
-                        
-                        # Initialize the struct header with same version header as can_send_test
-                        frame.structHeader.version = ((83 << 56) | (75 << 48) | (1 << 40) | (1 << 32) | (1 << 24))
-                        
-                        # Set basic frame properties
-                        frame.id = msg['id']
-                        frame.flags = 0
-                        frame.sdt = 0
-                        frame.vcid = 0
-                        frame.af = 0
-
-                        # Prepare data for CAN frame - directly use the bytes like in can_send_test
-                        original_data = bytes(msg.get('data', []))
-                        data_len = len(original_data)
-                        
-                        print(f"DEBUG: Converting to SilKit CAN frame: ID=0x{frame.id:x}, Raw Data={list(original_data)}")
-
-                        # Set DLC to match data length (up to 8 bytes) like in can_send_test
-                        # can_send_test simply uses actual data length for DLC
-                        if data_len <= 8:
-                            frame.dlc = data_len
+                        # Prepare data for CAN frame - directly use the bytes like in can_send_test.
+                        # A base64 string decodes in one call; a list of ints is kept for compatibility.
+                        if isinstance(data, str):
+                            original_data = b64decode(data)
                         else:
-                            # For CAN FD frames that exceed standard CAN limits
-                            if data_len <= 12:
-                                frame.dlc = 9
-                            elif data_len <= 16:
-                                frame.dlc = 10
-                            elif data_len <= 20:
-                                frame.dlc = 11
-                            elif data_len <= 24:
-                                frame.dlc = 12
-                            elif data_len <= 32:
-                                frame.dlc = 13
-                            elif data_len <= 48:
-                                frame.dlc = 14
-                            else:  # data_len <= 64
-                                frame.dlc = 15
-                                if data_len > 64:
-                                    print(f"Warning: CAN data exceeds 64 bytes, truncating to 64")
-                                    original_data = original_data[:64]
-                                    data_len = 64
-
-                        # Create a C-compatible buffer for the data - use static allocation approach
-                        data_buffer = (c_uint8 * data_len)(*original_data)
-                        
-                        # Store the buffer to prevent garbage collection - critical for Python
-                        self.data_buffers.append(data_buffer)
-                        if len(self.data_buffers) > 10:
-                            self.data_buffers.pop(0)  # Keep only recent buffers to avoid memory growth
+                            original_data = bytes(data)
                         
-                        # Set data pointer and size, using proper casting like can_send_test does
-                        frame.data.data = cast(data_buffer, POINTER(c_uint8))
-                        frame.data.size = data_len
-
-                        # Send the frame with proper parameters - exactly like can_send_test
-                        print(f"Sending CAN frame with ID: 0x{frame.id:x}, size: {data_len}")
-                        err = silkit.SilKit_CanController_SendFrame(
-                            self.can_controller,
-                            byref(frame),  # Use byref instead of ctypes.byref for consistency
-                            None           # userContext
-                        )
-                        
-                        if err != 0:
-                            print(f"Failed to send CAN frame: {err}")
-                        else:
-                            print(f"Successfully sent CAN frame with ID: 0x{frame.id:x}, length: {data_len}")
+                        logger.debug("Received JSON CAN message from TCP client: ID=0x%x, Data=%s", can_id, data)
+                        self.send_frame(can_id, original_data)
                         
+        except asyncio.IncompleteReadError as e:
+            if e.partial:
+                logger.warning("Incomplete message received from %s, closing connection", addr)
         except Exception as e:
-            print(f"Error handling client {addr}: {e}")
+            logger.error("Error handling client %s: %s", addr, e)
         finally:
+            # Forget the writer first: wait_closed() raises on exactly the broken
+            # connections this cleanup is for
+            writers.discard(writer)
             writer.close()
-            await writer.wait_closed()
-            self.clients.remove(writer)
-            print(f"Connection closed from {addr}")
+            try:
+                await writer.wait_closed()
+            except Exception as e:
+                logger.debug("Error closing connection from %s: %s", addr, e)
+            logger.info("Connection closed from %s", addr)
             
     def handle_can_message(self, controller, frame):
+        """Called on the SilKit thread: copy the frame out and hand it to the event loop."""
         try:
             # Get actual data size
             data_size = min(self.get_dlc_size(frame.dlc), frame.data.size) if frame.data.data else 0
             
-            print(f"DEBUG: SilKit->TCP - Handling CAN frame with ID: 0x{frame.id:x}, DLC: {frame.dlc}, Size: {data_size}")
+            logger.debug("SilKit->TCP - Handling CAN frame with ID: 0x%x, DLC: %d, Size: %d", frame.id, frame.dlc, data_size)
             
-            # Extract data bytes
-            data_array = []
-            if frame.data.data and data_size > 0:
-                for i in range(data_size):
-                    data_array.append(frame.data.data[i])
-                
-                print(f"DEBUG: SilKit->TCP - Frame data: {data_array}")
+            # Extract data bytes with a single memcpy, so no ctypes memory outlives the callback
+            payload = ctypes.string_at(frame.data.data, data_size) if data_size > 0 else b''
+            
+            loop = self._loop
+            if loop is None:
+                logger.debug("SilKit->TCP - Servers not running yet, dropping CAN frame 0x%x", frame.id)
+                return
+            loop.call_soon_threadsafe(self._enqueue_rx, (frame.id, payload))
+        except Exception as e:
+            logger.error("Error processing CAN message: %s", e)
+
+    def _enqueue_rx(self, item):
+        # Runs on the event loop thread
+        try:
+            self._rx_queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.rx_dropped += 1
+            logger.warning("SilKit->TCP - RX queue full, dropped CAN frame 0x%x (%d dropped so far)", item[0], self.rx_dropped)
+
+    async def _rx_consumer(self):
+        """Forward queued SilKit frames to all thermal clients."""
+        while True:
+            can_id, payload = await self._rx_queue.get()
             
             # Instead of JSON, create a simple binary format:
             # [4 bytes for ID][1 byte for length][N bytes of data]
-            raw_frame = bytearray()
-            
-            # Add CAN ID (4 bytes, network byte order)
-            raw_frame.extend(struct.pack('!I', frame.id))
-            
-            # Add data length (1 byte)
-            raw_frame.extend(struct.pack('!B', data_size))
-            
-            # Add actual data
-            for byte in data_array:
-                raw_frame.extend(struct.pack('!B', byte))
+            raw_frame = _HDR.pack(can_id, len(payload)) + payload
                 
-            # Send to all clients
-            client_count = 0
-            for writer in self.clients:
+            # Send to all thermal clients
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Raw frame: %s", raw_frame.hex(' '))
+            # write() never blocks, so the fan-out does not wait on any client. A client
+            # that stops reading is disconnected on its own once its unsent data exceeds
+            # CLIENT_WRITE_BUFFER_LIMIT, without holding up the others
+            writers = list(self.thermal_writers)
+            for writer in writers:
                 try:
-                    # Check if this is the thermal client (connected to 192.0.2.*)
-                    peer = writer.get_extra_info('peername')
-                    is_thermal = peer and peer[0].startswith('192.0.2.')
-                    
-                    if is_thermal:
-                        print(f"DEBUG: Sending raw CAN frame to thermal client at {peer}")
-                        print(f"DEBUG: Raw frame: {' '.join(f'{b:02x}' for b in raw_frame)}")
-                    
                     # Send raw frame without any length prefix
                     writer.write(raw_frame)
-                    client_count += 1
+                    if writer.transport.get_write_buffer_size() > CLIENT_WRITE_BUFFER_LIMIT:
+                        logger.warning("SilKit->TCP - Client %s is not reading, disconnecting it",
+                                       writer.get_extra_info('peername'))
+                        self.thermal_writers.discard(writer)
+                        writer.close()
                 except Exception as e:
-                    print(f"Error sending to client: {e}")
+                    logger.error("Error sending to client: %s", e)
             
-            print(f"DEBUG: SilKit->TCP - Sent raw CAN frame to {client_count} clients")
-        except Exception as e:
-            print(f"Error processing CAN message: {e}")
+            logger.debug("SilKit->TCP - Sent raw CAN frame to %d clients", len(writers))
             
     def get_dlc_size(self, dlc):
         """Convert DLC to actual data size for CAN FD"""
-        if dlc <= 8:
-            return dlc
-        elif dlc == 9:
-            return 12
-        elif dlc == 10:
-            return 16
-        elif dlc == 11:
-            return 20
-        elif dlc == 12:
-            return 24
-        elif dlc == 13:
-            return 32
-        elif dlc == 14:
-            return 48
-        elif dlc == 15:
-            return 64
-        return 0
-
-    def __del__(self):
-        # Cleanup SIL-Kit resources
-        if hasattr(self, 'lifecycle_service'):
-            silkit.SilKit_LifecycleService_Stop(self.lifecycle_service)
-            silkit.SilKit_LifecycleService_Destroy(self.lifecycle_service)
-        if hasattr(self, 'can_controller') and hasattr(self, 'handler_id'):
-            silkit.SilKit_CanController_RemoveFrameHandler(self.can_controller, self.handler_id)
-        if hasattr(self, 'can_controller'):
-            silkit.SilKit_CanController_Destroy(self.can_controller)
-        if hasattr(self, 'participant'):
-            silkit.SilKit_Participant_Destroy(self.participant)
-        if hasattr(self, 'participant_config'):
-            silkit.SilKit_ParticipantConfiguration_Destroy(self.participant_config)
+        return _DLC2SIZE[dlc] if dlc < 16 else 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Release SIL-Kit resources. Safe to call more than once."""
+        if self._closed:
+            return
+        self._closed = True
+        # Detach the RX trampoline first so it never sees a half torn-down bridge
+        silkit.SilKit_CanController_RemoveFrameHandler(self.can_controller, self.handler_id)
+        silkit.SilKit_LifecycleService_Stop(self.lifecycle_service, b"Bridge shutdown")
+        # The participant owns the lifecycle service and CAN controller
+        silkit.SilKit_Participant_Destroy(self.participant)
+        silkit.SilKit_ParticipantConfiguration_Destroy(self.participant_config)
+        logger.info("SilKit bridge closed")
                 
-    def send_test_frame(self):
-        # Create a frame struct
-        frame = CanFrame()
-        memset(byref(frame), 0, sizeof(frame))
-        
-        # Initialize like can_send_test
-        frame.structHeader.version = ((83 << 56) | (75 << 48) | (1 << 40) | (1 << 32) | (1 << 24))
-        
-        # Set simple test values
-        frame.id = 0x123
-        frame.flags = 0
-        frame.dlc = 8
-        
-        # Create data like in can_send_test
-        test_data = (c_uint8 * 8)(1, 2, 3, 4, 5, 6, 7, 8)
-        self.test_buffer = test_data  # Keep reference to prevent garbage collection
-        
-        # Set data in frame
-        frame.data.data = cast(test_data, POINTER(c_uint8))
-        frame.data.size = 8
-        
-        # Send the frame
-        print("Sending test frame with ID: 0x123")
-        err = silkit.SilKit_CanController_SendFrame(
-            self.can_controller, 
-            byref(frame), 
-            None
-        )
+    def send_frame(self, can_id, payload):
+        """Send a CAN frame with the given payload bytes to SilKit.
+
+        All outgoing traffic goes through this single entry point, so the
+        SilKit glue (frame setup, DLC encoding, buffer lifetime) lives in one place.
+
+        SendFrame serializes the frame, payload included, before it returns, so
+        the shared _tx_buf can be overwritten by the next call straight away. This
+        relies on send_frame only ever being called from the event loop thread.
+        """
+        data_len = len(payload)
+        if data_len > 64:
+            logger.warning("CAN data exceeds 64 bytes, truncating to 64")
+            payload = payload[:64]
+            data_len = 64
+
+        frame = self._tx_frame
+        frame.id = can_id
+
+        # DLC matches data length up to 8 bytes like in can_send_test,
+        # CAN FD lengths round up to the next DLC code
+        frame.dlc = _LEN2DLC[data_len]
+
+        # Copy the payload into the persistent buffer with a single memcpy
+        ctypes.memmove(self._tx_buf, payload, data_len)
+        frame.data.size = data_len
+
+        # Send the frame with proper parameters - exactly like can_send_test
+        err = _SEND(self.can_controller, self._tx_frame_ref, None)
         
         if err != 0:
-            print(f"Error sending test frame: {err}")
+            logger.error("Failed to send CAN frame with ID 0x%x: %s", can_id, err)
+            return False
+        logger.debug("Sent CAN frame with ID: 0x%x, length: %d", can_id, data_len)
+        return True
+
+    def send_test_frame(self):
+        # Send simple test values like in can_send_test
+        logger.info("Sending test frame with ID: 0x123")
+        if self.send_frame(0x123, bytes([1, 2, 3, 4, 5, 6, 7, 8])):
+            logger.info("Test frame sent successfully")
         else:
-            print("Test frame sent successfully")
+            logger.error("Error sending test frame")
 
 async def main():
-    bridge = SilKitBridge()
-    await bridge.start_servers()  # No need for parameters as they're hardcoded now
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    async with SilKitBridge() as bridge:
+        await bridge.start_servers()  # No need for parameters as they're hardcoded now
     
 if __name__ == '__main__':
+    # uvloop is optional; fall back to the default asyncio loop when it is not installed
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
     asyncio.run(main()) 
\ No newline at end of file
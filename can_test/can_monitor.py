@@ -2,9 +2,11 @@
 import ctypes
 from ctypes import (c_void_p, c_char_p, c_uint32, c_uint8, c_uint64, c_uint16,
                    POINTER, Structure, c_int, c_int8, byref, c_size_t, cast,
-                   memset, sizeof)
+                   string_at)
+import collections
 import signal
-import time
+import sys
+import threading
 
 # Load SIL-Kit shared library
 silkit = ctypes.CDLL("/home/frank/projects/sil-kit/build/Release/libSilKit.so")
@@ -12,6 +14,12 @@ silkit = ctypes.CDLL("/home/frank/projects/sil-kit/build/Release/libSilKit.so")
 # Define SIL-Kit constants
 SILKIT_DIRECTION_ANY = 3  # Receive AND transmit
 
+# Maximum number of received frames waiting to be printed
+EVENT_QUEUE_SIZE = 8192
+
+# Maximum number of frames printed per write
+DRAIN_BATCH_SIZE = 256
+
 # Define SIL-Kit structs
 class SilKit_StructHeader(Structure):
     _fields_ = [
@@ -53,7 +61,9 @@ class SilKit_LifecycleConfiguration(Structure):
     ]
 
 # Define CAN frame handler callback type
-FrameHandlerType = ctypes.CFUNCTYPE(None, c_void_p, c_void_p, POINTER(CanFrameEvent))
+# The frame event arrives as a raw address and is viewed in place with
+# CanFrameEvent.from_address, which avoids building a POINTER object per callback
+FrameHandlerType = ctypes.CFUNCTYPE(None, c_void_p, c_void_p, c_void_p)
 
 # Define function signatures
 silkit.SilKit_ParticipantConfiguration_FromString.argtypes = [POINTER(c_void_p), c_char_p]
@@ -86,57 +96,75 @@ silkit.SilKit_Participant_Destroy.restype = None
 silkit.SilKit_ParticipantConfiguration_Destroy.argtypes = [c_void_p]
 silkit.SilKit_ParticipantConfiguration_Destroy.restype = None
 
-# Global variable to control the main loop
-running = True
+# Handler contexts registered with SilKit, keyed by the value passed as userContext
+_CTX_MAP = {}
+
+# Single frame handler shared by every controller; the context identifies the
+# monitor and network the frame was received on
+@FrameHandlerType
+def _frame_handler(context, controller, frame_event):
+    if not frame_event:
+        return
+    event = CanFrameEvent.from_address(frame_event)
+    if not event.frame:
+        return
+    
+    # Runs on the SilKit thread: only copy the frame into a record, printing
+    # happens on the monitor's printer thread
+    monitor, network_name = _CTX_MAP[context]
+    frame = event.frame.contents
+    data = string_at(frame.data.data, frame.data.size) if frame.data.data else b''
+    monitor.event_q.append((network_name, event.direction, frame.id, frame.flags, frame.dlc, data))
+    monitor.event_ready.set()
+
+# Set by the signal handler to end the main loop
+_stop = threading.Event()
 
 def signal_handler(sig, frame):
-    global running
     print("\nShutting down...")
-    running = False
+    _stop.set()
 
-# Function to print CAN frame details
-def print_can_frame(frame, direction):
-    if not frame:
-        print("CAN Frame is NULL")
-        return
-    
-    direction_str = "TX" if direction == 1 else "RX" if direction == 2 else "??"
-    
-    print(f"CAN Frame ({direction_str}):")
-    print(f"  ID: 0x{frame.id:x}")
-    print(f"  Flags: 0x{frame.flags:x}")
-    print(f"  DLC: {frame.dlc}")
-    
-    if frame.data.data and frame.data.size > 0:
-        data_array = [frame.data.data[i] for i in range(frame.data.size)]
-        print(f"  Data size: {frame.data.size}")
-        print(f"  Data: {data_array}")
-    else:
-        print("  Data: NULL")
-    print("------")
+# Templates for a printed frame, bound once so formatting is a single % pass
+_DIRECTION_STR = {1: "TX", 2: "RX"}
+_FRAME_FMT = ("\nNetwork: %s\n"
+              "CAN Frame (%s):\n"
+              "  ID: 0x%x\n"
+              "  Flags: 0x%x\n"
+              "  DLC: %d\n").__mod__
+_DATA_FMT = "  Data size: %d\n  Data: %s\n------\n".__mod__
+_NO_DATA = "  Data: NULL\n------\n"
+
+# Function to format CAN frame details from a queued frame record
+def format_can_frame(network_name, direction, can_id, flags, dlc, data):
+    text = _FRAME_FMT((network_name.decode(), _DIRECTION_STR.get(direction, "??"), can_id, flags, dlc))
+    if data:
+        return text + _DATA_FMT((len(data), list(data)))
+    return text + _NO_DATA
+
+# SilKit_ReturnCode names, indexed by return code
+_ERR = (
+    "SUCCESS",
+    "UNSPECIFIEDERROR",
+    "NOTSUPPORTED",
+    "NOTIMPLEMENTED",
+    "BADPARAMETER",
+    "BUFFERTOOSMALL",
+    "TIMEOUT",
+    "UNSUPPORTEDSERVICE",
+    "WRONGSTATE",
+    "TYPECONVERSIONERROR",
+    "CONFIGURATIONERROR",
+    "PROTOCOLERROR",
+    "ASSERTIONERROR",
+    "EXTENSIONERROR",
+    "LOGICERROR",
+    "LENGTHERROR",
+    "OUTOFRANGEERROR"
+)
 
 # Get user-friendly error description
 def get_error_string(error_code):
-    error_strings = {
-        0: "SUCCESS",
-        1: "UNSPECIFIEDERROR",
-        2: "NOTSUPPORTED",
-        3: "NOTIMPLEMENTED",
-        4: "BADPARAMETER",
-        5: "BUFFERTOOSMALL",
-        6: "TIMEOUT",
-        7: "UNSUPPORTEDSERVICE",
-        8: "WRONGSTATE",
-        9: "TYPECONVERSIONERROR",
-        10: "CONFIGURATIONERROR",
-        11: "PROTOCOLERROR",
-        12: "ASSERTIONERROR",
-        13: "EXTENSIONERROR",
-        14: "LOGICERROR",
-        15: "LENGTHERROR",
-        16: "OUTOFRANGEERROR"
-    }
-    return error_strings.get(error_code, f"UNKNOWN_ERROR({error_code})")
+    return _ERR[error_code] if 0 <= error_code < len(_ERR) else f"UNKNOWN_ERROR({error_code})"
 
 class CANMonitor:
     def __init__(self):
@@ -145,6 +173,13 @@ class CANMonitor:
         
         print(f"Connecting to SilKit registry at {self.registry_uri.decode()}")
         
+        # Received frames are queued by the SilKit callbacks and printed by a
+        # background thread; when the printer falls behind the oldest frames are dropped
+        self.event_q = collections.deque(maxlen=EVENT_QUEUE_SIZE)
+        self.event_ready = threading.Event()
+        self.printer_thread = threading.Thread(target=self._drain_loop, daemon=True)
+        self.printer_thread.start()
+        
         # Create participant configuration
         self.participant_config = c_void_p()
         result = silkit.SilKit_ParticipantConfiguration_FromString(byref(self.participant_config), b"{}")
@@ -168,6 +203,7 @@ class CANMonitor:
         # Create separate controllers for different known networks
         self.controllers = []
         self.handler_ids = []
+        self.ctx_keys = []
         
         # Monitor different CAN networks
         self.networks = [b"CAN1", b"ANY_CAN_NETWORK"]
@@ -201,9 +237,9 @@ class CANMonitor:
             print(f"Started CAN controller for {network.decode()}")
         
         # Create lifecycle configuration
+        # ctypes zero-initializes new Structure instances, no memset needed
         lifecycle_config = SilKit_LifecycleConfiguration()
-        memset(byref(lifecycle_config), 0, sizeof(lifecycle_config))
-        lifecycle_config.structHeader.version = ((83 << 56) | (75 << 48) | (7 << 40) | (2 << 32) | (1 << 24))
+        lifecycle_config.structHeader.version = ((83 << 56) | (75 << 48) | (7 << 40) | (2 << 32) | (1 << 24))  # SK_ID_MAKE(Participant, SilKit_LifecycleConfiguration)
         lifecycle_config.operationMode = 20  # SilKit_OperationMode_Autonomous
         
         # Create lifecycle service
@@ -230,37 +266,19 @@ class CANMonitor:
         print("Press Ctrl+C to stop monitoring\n")
         
     def setup_can_handler(self, controller, network):
-        # We need to create a unique handler for each controller
-        # and store it to prevent garbage collection
-        
-        # Create a closure that captures self and network name
-        def create_handler(self_ref, network_name):
-            @ctypes.CFUNCTYPE(None, c_void_p, c_void_p, POINTER(CanFrameEvent))
-            def frame_handler(context, controller, frame_event):
-                if not frame_event:
-                    return
-                if not frame_event.contents.frame:
-                    return
-                    
-                print(f"\nNetwork: {network_name.decode()}")
-                print_can_frame(frame_event.contents.frame.contents, frame_event.contents.direction)
-            
-            return frame_handler
-            
-        handler = create_handler(self, network)
-        
-        # Store the handler to prevent garbage collection
-        # We need to store it in an instance variable so it persists
-        if not hasattr(self, 'frame_handlers'):
-            self.frame_handlers = []
-        self.frame_handlers.append(handler)
+        # All controllers share the module-level trampoline; SilKit hands back
+        # the context key, which maps to this monitor and the network name
+        ctx = (self, network)
+        ctx_key = id(ctx)
+        _CTX_MAP[ctx_key] = ctx
+        self.ctx_keys.append(ctx_key)
         
         # Register the handler
         handler_id = c_uint32()
         result = silkit.SilKit_CanController_AddFrameHandler(
             controller,
-            None,
-            handler,
+            ctx_key,
+            _frame_handler,
             SILKIT_DIRECTION_ANY,  # Monitor both RX and TX
             byref(handler_id)
         )
@@ -270,6 +288,27 @@ class CANMonitor:
             print(f"Added frame handler for {network.decode()}")
             self.handler_ids.append(handler_id)
     
+    def _drain_batch(self, max_events=DRAIN_BATCH_SIZE):
+        # Print up to max_events queued frames with a single write, returns the count
+        event_q = self.event_q
+        lines = []
+        for _ in range(max_events):
+            if not event_q:
+                break
+            lines.append(format_can_frame(*event_q.popleft()))
+        if lines:
+            sys.stdout.write(''.join(lines))
+            sys.stdout.flush()
+        return len(lines)
+    
+    def _drain_loop(self):
+        # Reap queued frames in bounded batches until the queue is empty
+        while True:
+            self.event_ready.wait()
+            self.event_ready.clear()
+            while self._drain_batch() == DRAIN_BATCH_SIZE:
+                pass
+    
     def cleanup(self):
         print("Cleaning up resources...")
         
@@ -283,6 +322,10 @@ class CANMonitor:
             silkit.SilKit_Participant_Destroy(self.participant)
             print("Participant destroyed")
         
+        # Drop the handler contexts now that no more callbacks can arrive
+        for ctx_key in getattr(self, 'ctx_keys', ()):
+            _CTX_MAP.pop(ctx_key, None)
+        
         # Destroy configuration
         if hasattr(self, 'participant_config') and self.participant_config:
             silkit.SilKit_ParticipantConfiguration_Destroy(self.participant_config)
@@ -297,10 +340,8 @@ def main():
         # Create and initialize the CAN monitor
         monitor = CANMonitor()
         
-        # Main loop - just wait for frames
-        global running
-        while running:
-            time.sleep(0.1)
+        # Block until Ctrl+C; frames are handled by the SilKit and printer threads
+        _stop.wait()
             
     except Exception as e:
         print(f"Error: {e}")
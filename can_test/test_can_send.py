@@ -4,33 +4,77 @@ Simple test script to send a single CAN frame with 2 bytes of data using SilKit.
 This helps test flags and basic frame configurations.
 """
 import ctypes
-from ctypes import c_void_p, c_char_p, c_uint32, c_uint8, c_uint64, POINTER, Structure, c_int8
+from ctypes import c_void_p, c_char_p, c_uint32, c_uint16, c_uint8, c_uint64, c_size_t, POINTER, Structure, c_int, c_int8, cast
 import time
 
 # Load SIL-Kit shared library
 silkit = ctypes.CDLL("/home/frank/projects/sil-kit/build/Release/libSilKit.so")
 
 # Define necessary structures
-class CanFrame(Structure):
-    _fields_ = [
-        ("id", c_uint32),
-        ("flags", c_uint32),
-        ("dlc", c_uint8),
-        ("data", c_uint8 * 8)  # Using 8 bytes array for standard CAN
-    ]
-
 class SilKit_StructHeader(Structure):
     _fields_ = [
         ("version", c_uint64),
         ("_reserved", c_uint64 * 3)
     ]
 
+class SilKit_ByteVector(Structure):
+    _fields_ = [
+        ("data", POINTER(c_uint8)),
+        ("size", c_size_t)
+    ]
+
+class CanFrame(Structure):
+    _fields_ = [
+        ("structHeader", SilKit_StructHeader),
+        ("id", c_uint32),
+        ("flags", c_uint32),
+        ("dlc", c_uint16),
+        ("sdt", c_uint8),
+        ("vcid", c_uint8),
+        ("af", c_uint32),
+        ("data", SilKit_ByteVector)
+    ]
+
 class SilKit_LifecycleConfiguration(Structure):
     _fields_ = [
         ("structHeader", SilKit_StructHeader),
         ("operationMode", c_int8)
     ]
 
+# Struct header version of SilKit_CanFrame
+FRAME_VERSION = (83 << 56) | (75 << 48) | (1 << 40) | (1 << 32) | (1 << 24)  # SK_ID_MAKE(Can, SilKit_CanFrame)
+
+# Define function signatures
+silkit.SilKit_ParticipantConfiguration_FromString.argtypes = [POINTER(c_void_p), c_char_p]
+silkit.SilKit_ParticipantConfiguration_FromString.restype = c_int
+
+silkit.SilKit_Participant_Create.argtypes = [POINTER(c_void_p), c_void_p, c_char_p, c_char_p]
+silkit.SilKit_Participant_Create.restype = c_int
+
+silkit.SilKit_CanController_Create.argtypes = [POINTER(c_void_p), c_void_p, c_char_p, c_char_p]
+silkit.SilKit_CanController_Create.restype = c_int
+
+silkit.SilKit_CanController_Start.argtypes = [c_void_p]
+silkit.SilKit_CanController_Start.restype = c_int
+
+silkit.SilKit_LifecycleService_Create.argtypes = [POINTER(c_void_p), c_void_p, POINTER(SilKit_LifecycleConfiguration)]
+silkit.SilKit_LifecycleService_Create.restype = c_int
+
+silkit.SilKit_LifecycleService_StartLifecycle.argtypes = [c_void_p]
+silkit.SilKit_LifecycleService_StartLifecycle.restype = c_int
+
+silkit.SilKit_LifecycleService_Stop.argtypes = [c_void_p, c_char_p]
+silkit.SilKit_LifecycleService_Stop.restype = c_int
+
+silkit.SilKit_CanController_SendFrame.argtypes = [c_void_p, POINTER(CanFrame), c_void_p]
+silkit.SilKit_CanController_SendFrame.restype = c_int
+
+silkit.SilKit_Participant_Destroy.argtypes = [c_void_p]
+silkit.SilKit_Participant_Destroy.restype = None
+
+silkit.SilKit_ParticipantConfiguration_Destroy.argtypes = [c_void_p]
+silkit.SilKit_ParticipantConfiguration_Destroy.restype = None
+
 def main():
     # Initialize SIL-Kit
     registry_uri = b"silkit://localhost:8500"
@@ -70,6 +114,7 @@ def main():
     err = silkit.SilKit_CanController_Create(
         ctypes.byref(can_controller),
         participant,
+        b"CanController1",
         can_channel_name
     )
     if err != 0:
@@ -106,7 +151,6 @@ def main():
     )
     if result != 0:
         print(f"Error: Failed to create lifecycle service: {result}")
-        silkit.SilKit_CanController_Destroy(can_controller)
         silkit.SilKit_Participant_Destroy(participant)
         silkit.SilKit_ParticipantConfiguration_Destroy(participant_config)
         return
@@ -116,8 +160,6 @@ def main():
     result = silkit.SilKit_LifecycleService_StartLifecycle(lifecycle_service)
     if result != 0:
         print(f"Error: Failed to start lifecycle: {result}")
-        silkit.SilKit_LifecycleService_Destroy(lifecycle_service)
-        silkit.SilKit_CanController_Destroy(can_controller)
         silkit.SilKit_Participant_Destroy(participant)
         silkit.SilKit_ParticipantConfiguration_Destroy(participant_config)
         return
@@ -129,25 +171,24 @@ def main():
     # Try multiple flag combinations to see what works
     flag_values = [0, 1, 2, 4, 8, 16, 32, 64, 128]
     
+    # Create the frame once with 2-byte data [10, 20] and only change the
+    # flags per test; the payload buffer must outlive every send
+    payload = (c_uint8 * 2)(10, 20)
+    frame = CanFrame()
+    frame.structHeader.version = FRAME_VERSION
+    frame.id = 0x123  # A standard 11-bit CAN ID
+    frame.dlc = 2  # 2 bytes
+    frame.data.data = cast(payload, POINTER(c_uint8))
+    frame.data.size = 2
+    
     for flag_value in flag_values:
-        # Create frame with current flag value
-        frame = CanFrame()
-        frame.id = 0x123  # A standard 11-bit CAN ID
         frame.flags = flag_value
-        frame.dlc = 2  # 2 bytes
-        
-        # Prepare 2-byte data [10, 20]
-        data_buffer = bytearray(8)  # 8-byte buffer (zero-initialized)
-        data_buffer[0] = 10
-        data_buffer[1] = 20
-        
-        # Assign to frame data
-        frame.data = (c_uint8 * 8)(*data_buffer)
         
         print(f"\nTest with flags=0x{flag_value:x}, dlc=2, data=[10, 20]")
         err = silkit.SilKit_CanController_SendFrame(
             can_controller,
-            ctypes.byref(frame)
+            ctypes.byref(frame),
+            None
         )
         print(f"Result: {'Success' if err == 0 else f'Error {err}'}")
         
@@ -156,9 +197,8 @@ def main():
     
     # Cleanup
     print("\n=== Cleaning Up ===")
-    silkit.SilKit_LifecycleService_Stop(lifecycle_service)
-    silkit.SilKit_LifecycleService_Destroy(lifecycle_service)
-    silkit.SilKit_CanController_Destroy(can_controller)
+    silkit.SilKit_LifecycleService_Stop(lifecycle_service, b"Test complete")
+    # The CAN controller and lifecycle service are owned by the participant
     silkit.SilKit_Participant_Destroy(participant)
     silkit.SilKit_ParticipantConfiguration_Destroy(participant_config)
     print("Cleanup complete")
@@ -2,30 +2,49 @@ import tkinter as tk
 from tkinter import ttk
 import json
 import ctypes
-from ctypes import c_void_p, c_char_p, c_uint32, c_uint8, c_uint64, POINTER, Structure, c_int, c_int8, byref
-import threading
-import time
+import queue
+from ctypes import c_void_p, c_char_p, c_uint32, c_uint16, c_uint8, c_uint64, c_size_t, POINTER, Structure, c_int, c_int8, byref, cast, string_at
+import struct
 
 # Load SIL-Kit shared library
 silkit = ctypes.CDLL('/home/frank/projects/sil-kit/build/Release/libSilKit.so')
 
 # Define SIL-Kit constants
-SILKIT_DIRECTION_RX = 1
+SILKIT_DIRECTION_RX = 2  # Receive direction (SilKit_Direction_Receive)
 SILKIT_OPERATIONMODE_AUTONOMOUS = 20
 
 # Define SIL-Kit structs
+class SilKit_StructHeader(Structure):
+    _fields_ = [
+        ("version", c_uint64),
+        ("_reserved", c_uint64 * 3)
+    ]
+
+class SilKit_ByteVector(Structure):
+    _fields_ = [
+        ("data", POINTER(c_uint8)),
+        ("size", c_size_t)
+    ]
+
 class CanFrame(Structure):
     _fields_ = [
+        ("structHeader", SilKit_StructHeader),
         ("id", c_uint32),
         ("flags", c_uint32),
-        ("dlc", c_uint8),
-        ("data", c_uint8 * 8)
+        ("dlc", c_uint16),
+        ("sdt", c_uint8),
+        ("vcid", c_uint8),
+        ("af", c_uint32),
+        ("data", SilKit_ByteVector)
     ]
 
-class SilKit_StructHeader(Structure):
+class CanFrameEvent(Structure):
     _fields_ = [
-        ("version", c_uint64),
-        ("_reserved", c_uint64 * 3)
+        ("structHeader", SilKit_StructHeader),
+        ("timestamp", c_uint64),
+        ("frame", POINTER(CanFrame)),
+        ("direction", c_uint32),
+        ("userContext", c_void_p)
     ]
 
 class SilKit_LifecycleConfiguration(Structure):
@@ -34,14 +53,64 @@ class SilKit_LifecycleConfiguration(Structure):
         ("operationMode", c_int8)
     ]
 
+# Struct header version of SilKit_CanFrame
+FRAME_VERSION = (83 << 56) | (75 << 48) | (1 << 40) | (1 << 32) | (1 << 24)  # SK_ID_MAKE(Can, SilKit_CanFrame)
+
 # Define CAN frame handler callback type
-CAN_FRAME_HANDLER = ctypes.CFUNCTYPE(None, c_void_p, POINTER(CanFrame), c_void_p)
+# The frame event arrives as a raw address and is viewed in place with CanFrameEvent.from_address
+CAN_FRAME_HANDLER = ctypes.CFUNCTYPE(None, c_void_p, c_void_p, c_void_p)
+
+# Define function signatures
+silkit.SilKit_ParticipantConfiguration_FromString.argtypes = [POINTER(c_void_p), c_char_p]
+silkit.SilKit_ParticipantConfiguration_FromString.restype = c_int
+
+silkit.SilKit_Participant_Create.argtypes = [POINTER(c_void_p), c_void_p, c_char_p, c_char_p]
+silkit.SilKit_Participant_Create.restype = c_int
+
+silkit.SilKit_CanController_Create.argtypes = [POINTER(c_void_p), c_void_p, c_char_p, c_char_p]
+silkit.SilKit_CanController_Create.restype = c_int
+
+silkit.SilKit_LifecycleService_Create.argtypes = [POINTER(c_void_p), c_void_p, POINTER(SilKit_LifecycleConfiguration)]
+silkit.SilKit_LifecycleService_Create.restype = c_int
+
+silkit.SilKit_LifecycleService_StartLifecycle.argtypes = [c_void_p]
+silkit.SilKit_LifecycleService_StartLifecycle.restype = c_int
+
+silkit.SilKit_LifecycleService_Stop.argtypes = [c_void_p, c_char_p]
+silkit.SilKit_LifecycleService_Stop.restype = c_int
+
+silkit.SilKit_CanController_AddFrameHandler.argtypes = [c_void_p, c_void_p, CAN_FRAME_HANDLER, c_uint32, POINTER(c_uint64)]
+silkit.SilKit_CanController_AddFrameHandler.restype = c_int
+
+silkit.SilKit_CanController_RemoveFrameHandler.argtypes = [c_void_p, c_uint64]
+silkit.SilKit_CanController_RemoveFrameHandler.restype = c_int
+
+silkit.SilKit_CanController_SendFrame.argtypes = [c_void_p, POINTER(CanFrame), c_void_p]
+silkit.SilKit_CanController_SendFrame.restype = c_int
+
+silkit.SilKit_Participant_Destroy.argtypes = [c_void_p]
+silkit.SilKit_Participant_Destroy.restype = None
+
+silkit.SilKit_ParticipantConfiguration_Destroy.argtypes = [c_void_p]
+silkit.SilKit_ParticipantConfiguration_Destroy.restype = None
+
+# Temperatures and setpoints travel as little-endian int32 in tenths of a degree
+_I32LE = struct.Struct('<i')
 
 class ACControlGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("AC Control System")
         
+        # Pending (label, text) updates queued by the CAN callback
+        self.ui_updates = queue.SimpleQueue()
+        
+        # Received frames are dispatched by CAN ID
+        self._dispatch = {
+            0x100: self._on_temperature,
+            0x200: self._on_status,
+        }
+        
         # Initialize SIL-Kit
         self.participant = None
         self.can_controller = None
@@ -50,6 +119,18 @@ class ACControlGUI:
         self.participant_config = None
         self.setup_silkit()
         
+        # Persistent TX frame, reused for every setpoint update; its data pointer
+        # is aimed once at a persistent payload buffer
+        self._tx_payload = (c_uint8 * 8)()
+        self._tx_frame = CanFrame()
+        self._tx_frame.structHeader.version = FRAME_VERSION
+        self._tx_frame.id = 0x300  # Setpoint message ID
+        self._tx_frame.flags = 0
+        self._tx_frame.dlc = 4
+        self._tx_frame.data.data = cast(self._tx_payload, POINTER(c_uint8))
+        self._tx_frame.data.size = 4
+        self._tx_frame_ref = byref(self._tx_frame)
+        
         # Create main frame
         main_frame = ttk.Frame(root, padding="10")
         main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
@@ -77,11 +158,9 @@ class ACControlGUI:
         # Start the SIL-Kit lifecycle
         self.start_lifecycle()
         
-        # Start the temperature update thread
+        # Label updates from the SIL-Kit thread are applied on Tk's own loop
         self.running = True
-        self.update_thread = threading.Thread(target=self.update_temperature)
-        self.update_thread.daemon = True
-        self.update_thread.start()
+        self.root.after(100, self._tick)
 
     def setup_silkit(self):
         # Create participant configuration
@@ -94,9 +173,9 @@ class ACControlGUI:
         self.participant = c_void_p()
         result = silkit.SilKit_Participant_Create(
             byref(self.participant),
+            self.participant_config,
             b"ac_control_gui",
-            b"silkit://localhost:8500",
-            self.participant_config
+            b"silkit://localhost:8500"
         )
         if result != 0:
             raise RuntimeError(f"Failed to create participant: {result}")
@@ -106,6 +185,7 @@ class ACControlGUI:
         result = silkit.SilKit_CanController_Create(
             byref(self.can_controller),
             self.participant,
+            b"CanController1",
             b"CAN1"
         )
         if result != 0:
@@ -126,12 +206,13 @@ class ACControlGUI:
         if result != 0:
             raise RuntimeError(f"Failed to create lifecycle service: {result}")
 
-        # Register CAN frame handler
-        self.handler_id = c_uint32()
+        # Register CAN frame handler, keeping a reference so the callback is not collected
+        self.frame_handler = CAN_FRAME_HANDLER(self.handle_can_frame)
+        self.handler_id = c_uint64()
         result = silkit.SilKit_CanController_AddFrameHandler(
             self.can_controller,
             None,
-            CAN_FRAME_HANDLER(self.handle_can_frame),
+            self.frame_handler,
             SILKIT_DIRECTION_RX,
             byref(self.handler_id)
         )
@@ -143,52 +224,58 @@ class ACControlGUI:
         if result != 0:
             raise RuntimeError(f"Failed to start lifecycle: {result}")
 
-    def handle_can_frame(self, controller, frame, user_data):
+    def handle_can_frame(self, context, controller, event_addr):
+        if not event_addr:
+            return
+        event = CanFrameEvent.from_address(event_addr)
+        if not event.frame:
+            return
+        frame = event.frame.contents
+        handler = self._dispatch.get(frame.id)
+        if handler and frame.data.data and frame.data.size:
+            handler(string_at(frame.data.data, frame.data.size))
+
+    def _on_temperature(self, data):
         # Process temperature data (ID 0x100)
-        if frame.contents.id == 0x100:
-            temp_bytes = bytes(frame.contents.data[:4])
-            temperature = int.from_bytes(temp_bytes, byteorder='little', signed=True) / 10.0
-            self.temp_label.config(text=f"{temperature}°C")
-        
+        if len(data) < 4:
+            return
+        temperature = _I32LE.unpack_from(data)[0] / 10.0
+        self.ui_updates.put((self.temp_label, f"{temperature}°C"))
+
+    def _on_status(self, data):
         # Process AC status (ID 0x200)
-        elif frame.contents.id == 0x200:
-            status = frame.contents.data[0]
-            status_text = "On" if status == 1 else "Off"
-            self.status_label.config(text=status_text)
+        status = data[0]
+        status_text = "On" if status == 1 else "Off"
+        self.ui_updates.put((self.status_label, status_text))
 
     def update_setpoint(self):
         setpoint = self.setpoint_var.get()
-        # Convert setpoint to bytes (multiply by 10 to keep one decimal place)
-        setpoint_int = int(setpoint * 10)
-        setpoint_bytes = setpoint_int.to_bytes(4, byteorder='little', signed=True)
         
-        # Create CAN frame
-        frame = CanFrame()
-        frame.id = 0x300  # Setpoint message ID
-        frame.dlc = 4
-        frame.flags = 0
-        for i, b in enumerate(setpoint_bytes):
-            frame.data[i] = b
+        # Pack the setpoint straight into the persistent TX payload
+        # (multiplied by 10 to keep one decimal place)
+        _I32LE.pack_into(self._tx_payload, 0, int(setpoint * 10))
         
         # Send CAN frame
-        result = silkit.SilKit_CanController_SendFrame(self.can_controller, byref(frame))
+        result = silkit.SilKit_CanController_SendFrame(self.can_controller, self._tx_frame_ref, None)
         if result != 0:
             print(f"Failed to send setpoint: {result}")
 
-    def update_temperature(self):
-        while self.running:
-            time.sleep(0.1)  # Small delay to prevent high CPU usage
-            self.root.update_idletasks()
+    def _tick(self):
+        # Runs on the Tk thread: apply the label updates queued by the CAN callback
+        updates = self.ui_updates
+        while not updates.empty():
+            label, text = updates.get_nowait()
+            label.config(text=text)
+        if self.running:
+            self.root.after(100, self._tick)
 
     def cleanup(self):
         self.running = False
         if self.handler_id is not None:
             silkit.SilKit_CanController_RemoveFrameHandler(self.can_controller, self.handler_id)
         if self.lifecycle_service is not None:
-            silkit.SilKit_LifecycleService_Stop(self.lifecycle_service)
-            silkit.SilKit_LifecycleService_Destroy(self.lifecycle_service)
-        if self.can_controller is not None:
-            silkit.SilKit_CanController_Destroy(self.can_controller)
+            silkit.SilKit_LifecycleService_Stop(self.lifecycle_service, b"GUI shutdown")
+        # The CAN controller and lifecycle service are owned by the participant
         if self.participant is not None:
             silkit.SilKit_Participant_Destroy(self.participant)
         if self.participant_config is not None:
@@ -3,23 +3,41 @@ import sys
 import ctypes
 from ctypes import (c_void_p, c_char_p, c_uint32, c_uint8, c_uint64, c_uint16,
                    POINTER, Structure, c_int, c_int8, byref, c_size_t, cast,
-                   memset, sizeof)
+                   memset, sizeof, string_at)
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                             QHBoxLayout, QPushButton, QLabel, QLCDNumber)
-from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtCore import Qt, QTimer, QSocketNotifier
 import time
+import os
+import logging
+import collections
 
-# Load SIL-Kit shared library
-silkit = ctypes.CDLL('/home/frank/projects/sil-kit/build/Release/libSilKit.so')
+logger = logging.getLogger('ACPanel')
 
-# Keep a global reference to the callback pointer to prevent garbage collection
-_global_frame_handler_ptr = None
+# Load SIL-Kit shared library, SILKIT_LIB overrides the default location
+silkit = ctypes.CDLL(os.environ.get('SILKIT_LIB', '/home/frank/projects/sil-kit/build/Release/libSilKit.so'))
 
 # Define SIL-Kit constants
 SILKIT_DIRECTION_RX = 2  # Receive direction (SilKit_Direction_Receive)
 SILKIT_OPERATIONMODE_AUTONOMOUS = 20  # Autonomous mode
 SILKIT_OPERATIONMODE_COORDINATED = 1  # Coordinated mode
 
+# Participant configuration: local participants talk over domain sockets, and
+# TCP (when used) sends small CAN frames immediately and acknowledges them at once
+PARTICIPANT_CONFIG = b'{"Middleware": {"EnableDomainSockets": true, "TcpNoDelay": true, "TcpQuickAck": true}}'
+
+# Maximum number of received frames waiting for the Qt thread; the oldest are dropped
+RX_QUEUE_SIZE = 256
+
+# Delay in ms over which received frames are coalesced into one display refresh
+DISPLAY_REFRESH_MS = 50
+
+# Delay in ms over which +/- clicks are coalesced into one control frame
+CONTROL_DEBOUNCE_MS = 30
+
+# Temperature in °C for each raw status byte (0.5 °C per bit)
+_HALF_DEGREES = tuple(i * 0.5 for i in range(256))
+
 # Define CAN frame flags
 SILKIT_CANFRAMEFLAG_IDE = 1 << 9  # Identifier Extension
 SILKIT_CANFRAMEFLAG_RTR = 1 << 4  # Remote Transmission Request
@@ -66,7 +84,9 @@ class SilKit_LifecycleConfiguration(Structure):
     ]
 
 # Define CAN frame handler callback type
-FrameHandlerType = ctypes.CFUNCTYPE(None, c_void_p, c_void_p, POINTER(CanFrameEvent))
+# The frame event arrives as a raw address and is viewed in place with
+# CanFrameEvent.from_address, which avoids building a POINTER object per callback
+FrameHandlerType = ctypes.CFUNCTYPE(None, c_void_p, c_void_p, c_void_p)
 
 # Define function signatures
 silkit.SilKit_ParticipantConfiguration_FromString.argtypes = [POINTER(c_void_p), c_char_p]
@@ -105,33 +125,76 @@ silkit.SilKit_CanController_Stop.restype = c_int
 silkit.SilKit_LifecycleService_Stop.argtypes = [c_void_p, c_char_p]
 silkit.SilKit_LifecycleService_Stop.restype = c_int
 
+# Panels registered with SilKit, keyed by the id() passed as the handler context
+_INSTANCES = {}
+
+# Single module-level frame handler; SilKit hands back the panel's id() as context
+@FrameHandlerType
+def _dispatch_can_frame(context, controller, frame_event):
+    panel = _INSTANCES.get(context)
+    if panel is not None:
+        panel.handle_can_frame(frame_event)
+
+# Bound once so the TX paths skip the CDLL attribute lookup
+_SEND = silkit.SilKit_CanController_SendFrame
+
+# SilKit struct header versions, evaluated once at import
+FRAME_VERSION = (83 << 56) | (75 << 48) | (1 << 40) | (1 << 32) | (1 << 24)  # SK_ID_MAKE(Can, SilKit_CanFrame)
+LIFECYCLE_VERSION = (83 << 56) | (75 << 48) | (7 << 40) | (2 << 32) | (1 << 24)  # SK_ID_MAKE(Participant, SilKit_LifecycleConfiguration)
+
+_STRUCT_VERSIONS = {
+    CanFrame: FRAME_VERSION,
+    SilKit_LifecycleConfiguration: LIFECYCLE_VERSION,
+}
+
 # Define SIL-Kit struct initialization
 def SilKit_Struct_Init(struct_type, struct_instance):
     memset(byref(struct_instance), 0, sizeof(struct_instance))
-    if struct_type == CanFrame:
-        struct_instance.structHeader.version = ((83 << 56) | (75 << 48) | (1 << 40) | (1 << 32) | (1 << 24))
-    elif struct_type == SilKit_LifecycleConfiguration:
-        struct_instance.structHeader.version = ((83 << 56) | (75 << 48) | (7 << 40) | (2 << 32) | (1 << 24))
+    struct_instance.structHeader.version = _STRUCT_VERSIONS[struct_type]
+
+# A TX frame fused with its classic CAN payload in one allocation
+class CanFrameInline(Structure):
+    _fields_ = [
+        ("frame", CanFrame),
+        ("payload", c_uint8 * 8)
+    ]
 
-# Utility function to print CAN frame details (similar to C version)
+# Build a persistent TX frame whose data pointer is aimed once at its inline
+# payload; senders only rewrite the payload bytes and send the same frame again.
+# The returned frame and payload both keep the underlying CanFrameInline alive.
+def make_tx_frame(can_id, size):
+    tx = CanFrameInline()
+    frame = tx.frame
+    # ctypes zero-initializes tx, so only the header version needs writing
+    frame.structHeader.version = FRAME_VERSION
+    frame.id = can_id
+    frame.flags = 0 # Standard ID, Data frame
+    frame.dlc = size
+    frame.data.data = cast(tx.payload, POINTER(c_uint8))
+    frame.data.size = size
+    return frame, tx.payload
+
+# Utility function to log CAN frame details (similar to C version), at DEBUG level only
 def print_can_frame(frame):
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
     if not frame:
-        print("CAN Frame is NULL")
+        logger.debug("CAN Frame is NULL")
         return
     
-    print("CAN Frame details:")
-    print(f"  ID: 0x{frame.id:x}")
-    print(f"  Flags: 0x{frame.flags:x}")
-    print(f"  DLC: {frame.dlc}")
-    
     if frame.data.data and frame.data.size > 0:
-        data_array = [frame.data.data[i] for i in range(frame.data.size)]
-        print(f"  Data size: {frame.data.size}")
-        print(f"  Data: {data_array}")
+        data_text = "Data size: %d, Data: %s" % (frame.data.size, list(string_at(frame.data.data, frame.data.size)))
     else:
-        print("  Data: NULL")
+        data_text = "Data: NULL"
+    logger.debug("CAN Frame details: ID: 0x%x, Flags: 0x%x, DLC: %d, %s", frame.id, frame.flags, frame.dlc, data_text)
 
 class ACPanel(QMainWindow):
+    # Status label text and stylesheet for each AC power state
+    AC_STATUS_STYLES = {
+        True: ("AC Status: ON", "QLabel { color : green; }"),
+        False: ("AC Status: OFF", "QLabel { color : red; }"),
+    }
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Vehicle AC Control Panel")
@@ -146,8 +209,15 @@ class ACPanel(QMainWindow):
         self.HVAC_POWER_CMD_ID = 0xAC2  # ID to send AC ON/OFF command
         self.HVAC_STATUS_ID_FROM_ECU = 0x125 # ID from HVAC with actual status
         self.AC_STATE_BYTE_IDX_IN_STATUS = 2 # Index of AC state in 0x125
+        self.HVAC_CONTROL_ID = 0x123 # ID to send power, requested temp and fan speed
 
-        print(f"AC Panel initializing with name {self.participant_name.decode()}")
+        # Preallocated TX frames, one per outgoing message ID
+        self._power_frame, self._power_buf = make_tx_frame(self.HVAC_POWER_CMD_ID, 1)
+        self._power_frame_ref = byref(self._power_frame)
+        self._control_frame, self._control_buf = make_tx_frame(self.HVAC_CONTROL_ID, 3)
+        self._control_frame_ref = byref(self._control_frame)
+
+        logger.info("AC Panel initializing with name %s", self.participant_name.decode())
         
         # Initialize state
         self.cabin_temp = 22.0
@@ -159,25 +229,59 @@ class ACPanel(QMainWindow):
         self.last_requested_power_state = False # To toggle ON/OFF requests
         self.mode = 'auto'
         
+        # Received (can_id, dlc, data) records, appended by the SIL-Kit thread
+        # and drained on the Qt thread, which alone touches state and widgets
+        self.rx_queue = collections.deque(maxlen=RX_QUEUE_SIZE)
+        # Signalled by handle_can_frame after each append to wake the Qt thread
+        self.rx_fd = os.eventfd(0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+        
+        # SIL-Kit handles, filled in by initialize_silkit
+        self.participant_config = None
+        self.participant = None
+        self.lifecycle_service = None
+        self.can_controller = None
+        
         # Initialize SIL-Kit
         self.initialize_silkit()
         
         # Initialize UI
         self.initialize_ui()
         
-        print("AC Panel initialized successfully")
+        # Drain received frames on the Qt thread whenever the eventfd is signalled
+        self.rx_notifier = QSocketNotifier(self.rx_fd, QSocketNotifier.Type.Read, self)
+        self.rx_notifier.activated.connect(self.process_silkit_events)
+        
+        # Newest (dlc, data) per CAN ID, applied to the displays when refresh_timer fires
+        self.rx_latest = {}
+        # Last (dlc, data) applied per CAN ID, repeats of it are not decoded again
+        self.last_rx_frames = {}
+        # Received frames are dispatched by CAN ID
+        self.rx_dispatch = {
+            self.HVAC_STATUS_ID_FROM_ECU: self.handle_hvac_status, # 0x125
+        }
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.timeout.connect(self.refresh_displays)
+        
+        # Rapid +/- clicks restart this timer, only the final state is sent
+        self.control_timer = QTimer(self)
+        self.control_timer.setSingleShot(True)
+        self.control_timer.setInterval(CONTROL_DEBOUNCE_MS)
+        self.control_timer.timeout.connect(self.send_temperature_message)
+        
+        logger.info("AC Panel initialized successfully")
 
     def initialize_silkit(self):
-        print("Creating participant configuration...")
+        logger.info("Creating participant configuration...")
         # Create participant configuration
         self.participant_config = c_void_p()
-        result = silkit.SilKit_ParticipantConfiguration_FromString(byref(self.participant_config), b"{}")
+        result = silkit.SilKit_ParticipantConfiguration_FromString(byref(self.participant_config), PARTICIPANT_CONFIG)
         if result != 0:
             raise RuntimeError(f"Failed to create participant configuration: {result}")
-        print("Participant configuration created.")
+        logger.info("Participant configuration created.")
 
         # Create participant
-        print("Creating participant...")
+        logger.info("Creating participant...")
         self.participant = c_void_p()
         result = silkit.SilKit_Participant_Create(
             byref(self.participant),
@@ -188,16 +292,16 @@ class ACPanel(QMainWindow):
         if result != 0:
             silkit.SilKit_ParticipantConfiguration_Destroy(self.participant_config)
             raise RuntimeError(f"Failed to create participant: {result}")
-        print("Participant created.")
+        logger.info("Participant created.")
 
         # Create lifecycle configuration
-        print("Creating lifecycle configuration...")
+        logger.info("Creating lifecycle configuration...")
         lifecycle_config = SilKit_LifecycleConfiguration()
         SilKit_Struct_Init(SilKit_LifecycleConfiguration, lifecycle_config)
         lifecycle_config.operationMode = SILKIT_OPERATIONMODE_AUTONOMOUS
 
         # Create lifecycle service
-        print("Creating lifecycle service...")
+        logger.info("Creating lifecycle service...")
         self.lifecycle_service = c_void_p()
         result = silkit.SilKit_LifecycleService_Create(
             byref(self.lifecycle_service),
@@ -208,10 +312,10 @@ class ACPanel(QMainWindow):
             silkit.SilKit_Participant_Destroy(self.participant)
             silkit.SilKit_ParticipantConfiguration_Destroy(self.participant_config)
             raise RuntimeError(f"Failed to create lifecycle service: {result}")
-        print("Lifecycle service created.")
+        logger.info("Lifecycle service created.")
         
         # Create CAN controller
-        print(f"Creating CAN controller on network {self.can_network_name.decode()}...")
+        logger.info("Creating CAN controller on network %s...", self.can_network_name.decode())
         self.can_controller = c_void_p()
         result = silkit.SilKit_CanController_Create(
             byref(self.can_controller),
@@ -223,28 +327,26 @@ class ACPanel(QMainWindow):
             silkit.SilKit_Participant_Destroy(self.participant)
             silkit.SilKit_ParticipantConfiguration_Destroy(self.participant_config)
             raise RuntimeError(f"Failed to create CAN controller: {result}")
-        print("CAN controller created.")
+        logger.info("CAN controller created.")
 
         # Set CAN baud rate (500 kbps)
-        print("Setting CAN baud rate...")
+        logger.info("Setting CAN baud rate...")
         result = silkit.SilKit_CanController_SetBaudRate(self.can_controller, 500000, 0, 0)
         if result != 0:
             silkit.SilKit_Participant_Destroy(self.participant)
             silkit.SilKit_ParticipantConfiguration_Destroy(self.participant_config)
             raise RuntimeError(f"Failed to set CAN baud rate: {result}")
-        print("CAN baud rate set.")
+        logger.info("CAN baud rate set.")
 
         # Add CAN frame handler
-        print("Adding CAN frame handler...")
+        logger.info("Adding CAN frame handler...")
         self.handler_id = c_uint32()
-        global _global_frame_handler_ptr
-        self.frame_handler_callback = FrameHandlerType(self.handle_can_frame)
-        _global_frame_handler_ptr = self.frame_handler_callback
+        _INSTANCES[id(self)] = self
 
         result = silkit.SilKit_CanController_AddFrameHandler(
             self.can_controller,
-            None,  # context
-            self.frame_handler_callback,
+            id(self),  # context, maps back to this panel in _INSTANCES
+            _dispatch_can_frame,
             SILKIT_DIRECTION_RX,
             byref(self.handler_id)
         )
@@ -252,25 +354,25 @@ class ACPanel(QMainWindow):
             silkit.SilKit_Participant_Destroy(self.participant)
             silkit.SilKit_ParticipantConfiguration_Destroy(self.participant_config)
             raise RuntimeError(f"Failed to add CAN handler: {result}")
-        print(f"CAN frame handler added with ID: {self.handler_id.value}")
+        logger.info("CAN frame handler added with ID: %d", self.handler_id.value)
 
         # Start CAN controller
-        print("Starting CAN controller...")
+        logger.info("Starting CAN controller...")
         result = silkit.SilKit_CanController_Start(self.can_controller)
         if result != 0:
             silkit.SilKit_Participant_Destroy(self.participant)
             silkit.SilKit_ParticipantConfiguration_Destroy(self.participant_config)
             raise RuntimeError(f"Failed to start CAN controller: {result}")
-        print("CAN controller started.")
+        logger.info("CAN controller started.")
         
         # Start lifecycle
-        print("Starting lifecycle...")
+        logger.info("Starting lifecycle...")
         result = silkit.SilKit_LifecycleService_StartLifecycle(self.lifecycle_service)
         if result != 0:
             silkit.SilKit_Participant_Destroy(self.participant)
             silkit.SilKit_ParticipantConfiguration_Destroy(self.participant_config)
             raise RuntimeError(f"Failed to start lifecycle: {result}")
-        print("Lifecycle started.")
+        logger.info("Lifecycle started.")
 
     def initialize_ui(self):
         # Create main widget and layout
@@ -344,105 +446,98 @@ class ACPanel(QMainWindow):
         self.update_fan_display()
 
     def update_ac_status_display(self):
-        status_text = "AC Status: ON" if self.actual_ac_power_state else "AC Status: OFF"
+        # Only called when the state changed, so the stylesheet is reparsed once per change
+        status_text, status_style = self.AC_STATUS_STYLES[self.actual_ac_power_state]
         self.ac_status_label.setText(status_text)
-        # Optionally change color too
-        if self.actual_ac_power_state:
-            self.ac_status_label.setStyleSheet("QLabel { color : green; }")
-        else:
-            self.ac_status_label.setStyleSheet("QLabel { color : red; }")
+        self.ac_status_label.setStyleSheet(status_style)
 
     def update_cabin_temp_display(self):
-        self.cabin_temp_display.display(f"{self.cabin_temp:.1f}")
+        self.cabin_temp_display.display("%.1f" % self.cabin_temp)
 
     def update_external_temp_display(self): # New method
-        self.external_temp_display.display(f"{self.external_temp:.1f}")
+        self.external_temp_display.display("%.1f" % self.external_temp)
 
     def update_requested_temp_display(self):
-        self.requested_temp_display.display(f"{self.requested_temp:.1f}")
+        self.requested_temp_display.display("%.1f" % self.requested_temp)
 
     def update_fan_display(self):
-        self.fan_speed_display.setText(f"Fan: {self.fan_speed}")
+        self.fan_speed_display.setText("Fan: %d" % self.fan_speed)
 
     def request_ac_power_toggle(self):
         # Determine the new state to request (opposite of actual) and update last_requested_power_state.
         self.last_requested_power_state = not self.actual_ac_power_state
         requested_state_byte = int(self.last_requested_power_state) # True -> 1, False -> 0
 
-        print(f"Power button clicked. Requesting AC to be {'ON' if self.last_requested_power_state else 'OFF'} (Actual was: {self.actual_ac_power_state})")
+        logger.info("Power button clicked. Requesting AC to be %s (Actual was: %s)", 'ON' if self.last_requested_power_state else 'OFF', self.actual_ac_power_state)
         
-        # Prepare CAN frame data for HVAC_POWER_CMD_ID (0xAC2)
+        # Fill the preallocated HVAC_POWER_CMD_ID (0xAC2) frame
         # Assuming data format is [state_byte]
-        can_data_payload = bytes([requested_state_byte])
-        
-        frame = CanFrame()
-        SilKit_Struct_Init(CanFrame, frame)
-        frame.id = self.HVAC_POWER_CMD_ID 
-        frame.flags = 0 # Standard ID, Data frame
-        frame.dlc = len(can_data_payload)
-        
-        # Create a temporary ctypes buffer for the data payload
-        # and assign it to the SilKit_ByteVector
-        temp_data_buffer = (c_uint8 * len(can_data_payload))(*can_data_payload)
-        frame.data.data = cast(temp_data_buffer, POINTER(c_uint8))
-        frame.data.size = len(can_data_payload)
+        self._power_buf[0] = requested_state_byte
 
-        print(f"Sending CAN Command - ID: 0x{frame.id:X}, DLC: {frame.dlc}, Data: {list(can_data_payload)}")
-        # print_can_frame(frame) # For more detailed debug if needed
+        logger.debug("Sending CAN Command - ID: 0x%X, DLC: 1, Data: [%d]", self.HVAC_POWER_CMD_ID, requested_state_byte)
+        # print_can_frame(self._power_frame) # For more detailed debug if needed
 
-        result = silkit.SilKit_CanController_SendFrame(self.can_controller, byref(frame), None)
+        result = _SEND(self.can_controller, self._power_frame_ref, None)
         if result != 0:
-            print(f"Error sending AC Power command: {result}")
+            logger.error("Error sending AC Power command: %s", result)
         else:
-            print("AC Power command sent successfully.")
+            logger.debug("AC Power command sent successfully.")
 
-    def handle_can_frame(self, context, controller, frame_event):
-        # This function is called from a SIL-Kit internal thread.
-        # Be careful with GUI updates from here; consider using Qt signals if issues arise.
-        if not frame_event or not frame_event.contents.frame:
-            print("Received NULL frame_event or frame in handle_can_frame")
+    def handle_can_frame(self, frame_event):
+        # This function is called from a SIL-Kit internal thread: it only copies
+        # the frame into rx_queue, process_silkit_events applies it on the Qt thread
+        if not frame_event:
+            logger.debug("Received NULL frame_event in handle_can_frame")
+            return
+        event = CanFrameEvent.from_address(frame_event)
+        if not event.frame:
+            logger.debug("Received NULL frame in handle_can_frame")
             return
 
-        received_frame = frame_event.contents.frame.contents
-        can_id = received_frame.id
+        received_frame = event.frame.contents
         dlc = received_frame.dlc
         
-        # Ensure data is accessible
+        # Ensure data is accessible, then copy it out with a single memcpy
         if received_frame.data.data and dlc > 0 and dlc <= 8:
-            data_bytes = bytes(received_frame.data.data[0:dlc])
+            data_bytes = string_at(received_frame.data.data, dlc)
         else:
             data_bytes = b''
 
-        # print(f"Panel RX - ID: 0x{can_id:X}, DLC: {dlc}, Data: {list(data_bytes)}") # Debug all received frames
-
-        if can_id == self.HVAC_STATUS_ID_FROM_ECU: # 0x125
-            if dlc > self.AC_STATE_BYTE_IDX_IN_STATUS: # data[2] for 0x125 (and implies data[0], data[1] exist)
-                new_ac_state_byte = data_bytes[self.AC_STATE_BYTE_IDX_IN_STATUS]
-                self.actual_ac_power_state = (new_ac_state_byte == 1)
-                
-                # Update cabin temperature from data[0]
-                if dlc > 0: # Should always be true if dlc > AC_STATE_BYTE_IDX_IN_STATUS (2)
-                    self.cabin_temp = float(data_bytes[0]) / 2.0
-                
-                # Update external temperature from data[1]
-                if dlc > 1: # Check if data[1] is available
-                    self.external_temp = float(data_bytes[1]) / 2.0
-
-                # Update fan speed from data[3]
-                if dlc > 3:
-                     self.fan_speed = data_bytes[3]
-
-                print(f"Received HVAC Status (0x{can_id:X}): Actual AC Power={self.actual_ac_power_state}, CabinTemp={self.cabin_temp:.1f}, ExternalTemp={self.external_temp:.1f}, FanSpeed={self.fan_speed}")
-                
-                # IMPORTANT: GUI updates should be done safely, e.g., via signals or QTimer.singleShot
-                # For simplicity here, direct update, but watch for threading issues.
-                QTimer.singleShot(0, self.update_ac_status_display)
-                QTimer.singleShot(0, self.update_cabin_temp_display)
-                QTimer.singleShot(0, self.update_external_temp_display) # Add call to update external temp display
-                QTimer.singleShot(0, self.update_fan_display)
-            else:
-                print(f"Received HVAC Status (0x{can_id:X}) but DLC {dlc} is too short for all expected data fields.")
-        # Add handling for other CAN IDs if necessary
+        self.rx_queue.append((received_frame.id, dlc, data_bytes))
+        os.eventfd_write(self.rx_fd, 1)
+
+    def handle_hvac_status(self, can_id, dlc, data_bytes):
+        # Runs on the Qt thread. Check the copied payload, not dlc: it is empty for CAN FD
+        # frames (dlc > 8) and NULL data, and an IndexError here would abort the panel
+        size = len(data_bytes)
+        if size > self.AC_STATE_BYTE_IDX_IN_STATUS: # data[2] for 0x125 (and implies data[0], data[1] exist)
+            new_ac_state_byte = data_bytes[self.AC_STATE_BYTE_IDX_IN_STATUS]
+            ac_power_state = (new_ac_state_byte == 1)
+            
+            # data[0] (cabin) and data[1] (external) always exist since size > AC_STATE_BYTE_IDX_IN_STATUS (2)
+            cabin_temp = _HALF_DEGREES[data_bytes[0]]
+            external_temp = _HALF_DEGREES[data_bytes[1]]
+
+            # Update fan speed from data[3]
+            fan_speed = data_bytes[3] if size > 3 else self.fan_speed
+
+            logger.debug("Received HVAC Status (0x%X): Actual AC Power=%s, CabinTemp=%.1f, ExternalTemp=%.1f, FanSpeed=%d", can_id, ac_power_state, cabin_temp, external_temp, fan_speed)
+            
+            # Only the displays whose value actually changed are refreshed
+            if ac_power_state != self.actual_ac_power_state:
+                self.actual_ac_power_state = ac_power_state
+                self.update_ac_status_display()
+            if cabin_temp != self.cabin_temp:
+                self.cabin_temp = cabin_temp
+                self.update_cabin_temp_display()
+            if external_temp != self.external_temp:
+                self.external_temp = external_temp
+                self.update_external_temp_display()
+            if fan_speed != self.fan_speed:
+                self.fan_speed = fan_speed
+                self.update_fan_display()
+        else:
+            logger.warning("Received HVAC Status (0x%X) but DLC %d (%d data bytes) is too short for all expected data fields.", can_id, dlc, size)
 
     def send_temperature_message(self):
         # This will send the self.requested_temp
@@ -468,69 +563,116 @@ class ACPanel(QMainWindow):
         temp_byte = int(self.requested_temp * 2) # As per HVAC_CONTROL_ID format
         fan_byte = self.fan_speed
 
-        can_data_payload = bytes([ac_on_byte, temp_byte, fan_byte])
-        msg_id = 0x123 # HVAC_CONTROL_ID
-
-        frame = CanFrame()
-        SilKit_Struct_Init(CanFrame, frame)
-        frame.id = msg_id
-        frame.flags = 0 # Standard ID, Data frame
-        frame.dlc = len(can_data_payload)
-        
-        temp_data_buffer = (c_uint8 * len(can_data_payload))(*can_data_payload)
-        frame.data.data = cast(temp_data_buffer, POINTER(c_uint8))
-        frame.data.size = len(can_data_payload)
+        # Fill the preallocated HVAC_CONTROL_ID (0x123) frame
+        buf = self._control_buf
+        buf[0] = ac_on_byte
+        buf[1] = temp_byte
+        buf[2] = fan_byte
 
-        print(f"Sending Temp/Control Command - ID: 0x{frame.id:X}, DLC: {frame.dlc}, Data: {list(can_data_payload)}")
-        result = silkit.SilKit_CanController_SendFrame(self.can_controller, byref(frame), None)
+        logger.debug("Sending Temp/Control Command - ID: 0x%X, DLC: 3, Data: [%d, %d, %d]", self.HVAC_CONTROL_ID, ac_on_byte, temp_byte, fan_byte)
+        result = _SEND(self.can_controller, self._control_frame_ref, None)
         if result != 0:
-            print(f"Error sending Temp/Control command: {result}")
+            logger.error("Error sending Temp/Control command: %s", result)
         else:
-            print("Temp/Control command sent successfully.")
+            logger.debug("Temp/Control command sent successfully.")
 
     def increase_temp(self):
-        self.requested_temp = min(30.0, self.requested_temp + 0.5)
+        value = min(30.0, self.requested_temp + 0.5)
+        if value == self.requested_temp:
+            return # Already at the limit, nothing to redraw or send
+        self.requested_temp = value
         self.update_requested_temp_display()
-        self.send_temperature_message() # Send updated requested temp
+        self.control_timer.start() # Send updated requested temp once clicks settle
 
     def decrease_temp(self):
-        self.requested_temp = max(15.0, self.requested_temp - 0.5)
+        value = max(15.0, self.requested_temp - 0.5)
+        if value == self.requested_temp:
+            return # Already at the limit, nothing to redraw or send
+        self.requested_temp = value
         self.update_requested_temp_display()
-        self.send_temperature_message() # Send updated requested temp
+        self.control_timer.start() # Send updated requested temp once clicks settle
 
     def increase_fan(self):
-        self.fan_speed = min(5, self.fan_speed + 1)
+        value = min(5, self.fan_speed + 1)
+        if value == self.fan_speed:
+            return # Already at the limit, nothing to redraw or send
+        self.fan_speed = value
+        self.last_rx_frames.pop(self.HVAC_STATUS_ID_FROM_ECU, None) # Let the next status frame correct fan_speed again
         self.update_fan_display()
-        self.send_temperature_message() # Fan speed is part of HVAC_CONTROL_ID
+        self.control_timer.start() # Fan speed is part of HVAC_CONTROL_ID
 
     def decrease_fan(self):
-        self.fan_speed = max(1, self.fan_speed - 1)
+        value = max(1, self.fan_speed - 1)
+        if value == self.fan_speed:
+            return # Already at the limit, nothing to redraw or send
+        self.fan_speed = value
+        self.last_rx_frames.pop(self.HVAC_STATUS_ID_FROM_ECU, None) # Let the next status frame correct fan_speed again
         self.update_fan_display()
-        self.send_temperature_message() # Fan speed is part of HVAC_CONTROL_ID
+        self.control_timer.start() # Fan speed is part of HVAC_CONTROL_ID
 
     def closeEvent(self, event):
-        print("Closing AC Panel...")
-        if hasattr(self, 'can_controller') and self.can_controller:
-            print("Stopping CAN controller...")
+        logger.info("Closing AC Panel...")
+        self.refresh_timer.stop()
+        # Flush a setpoint change still waiting out the debounce while the controller can send it
+        if self.control_timer.isActive():
+            self.control_timer.stop()
+            if self.can_controller:
+                self.send_temperature_message()
+        if self.can_controller:
+            logger.info("Stopping CAN controller...")
             silkit.SilKit_CanController_Stop(self.can_controller)
-        if hasattr(self, 'lifecycle_service') and self.lifecycle_service:
-            print("Stopping lifecycle service...")
+        _INSTANCES.pop(id(self), None)
+        if self.lifecycle_service:
+            logger.info("Stopping lifecycle service...")
             silkit.SilKit_LifecycleService_Stop(self.lifecycle_service, b"ACPanel_Shutdown")
         # No direct destroy for controller, participant manages it.
-        if hasattr(self, 'participant') and self.participant:
-            print("Destroying participant...")
+        if self.participant:
+            logger.info("Destroying participant...")
             # SilKit_Participant_Destroy(self.participant) # This can cause issues if lifecycle not fully stopped
-        if hasattr(self, 'participant_config') and self.participant_config:
+        if self.participant_config:
             # SilKit_ParticipantConfiguration_Destroy(self.participant_config)
             pass # Usually configuration is destroyed when participant is.
-        print("AC Panel cleanup finished.")
+        # SIL-Kit threads may still signal rx_fd until the process exits, so it
+        # stays open; only stop listening to it
+        self.rx_notifier.setEnabled(False)
+        logger.info("AC Panel cleanup finished.")
         super().closeEvent(event)
 
-    # Dummy process_silkit_events, SIL Kit does its own event processing
+    # Apply the frames queued by handle_can_frame, SIL Kit does its own event processing
     def process_silkit_events(self):
-        pass
+        # Reset the eventfd counter first, so frames queued while draining wake us again
+        try:
+            os.eventfd_read(self.rx_fd)
+        except BlockingIOError:
+            pass
+
+        # Only the newest frame per CAN ID is shown, so fold the queue down to
+        # one frame per ID and refresh the displays once per DISPLAY_REFRESH_MS
+        rx_queue = self.rx_queue
+        latest = self.rx_latest
+        while rx_queue:
+            can_id, dlc, data_bytes = rx_queue.popleft()
+            # logger.debug("Panel RX - ID: 0x%X, DLC: %d, Data: %s", can_id, dlc, list(data_bytes)) # Debug all received frames
+            latest[can_id] = (dlc, data_bytes)
+
+        if latest and not self.refresh_timer.isActive():
+            self.refresh_timer.start(DISPLAY_REFRESH_MS)
+
+    def refresh_displays(self):
+        # ECUs broadcast their status at a fixed rate, most frames repeat the last one
+        last = self.last_rx_frames
+        for can_id, frame in self.rx_latest.items():
+            handler = self.rx_dispatch.get(can_id)
+            if handler is not None and frame != last.get(can_id):
+                last[can_id] = frame
+                handler(can_id, *frame)
+        self.rx_latest.clear()
 
 def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
     app = QApplication(sys.argv)
     window = ACPanel()
     window.show()
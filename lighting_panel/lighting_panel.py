@@ -3,19 +3,18 @@ import sys
 import ctypes
 from ctypes import (c_void_p, c_char_p, c_uint32, c_uint8, c_uint64, c_uint16,
                    POINTER, Structure, c_int, c_int8, byref, c_size_t, cast,
-                   memset, sizeof)
+                   string_at)
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                             QHBoxLayout, QGroupBox, QRadioButton, QLabel,
                             QButtonGroup)
-from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtCore import Qt, QTimer, QSocketNotifier
 import time
 import os
 import logging
-from enum import Enum
-from datetime import datetime, timedelta
+import collections
 
-# Load SIL-Kit shared library
-silkit = ctypes.CDLL('/home/frank/projects/sil-kit/build/Release/libSilKit.so')
+# Load SIL-Kit shared library, SILKIT_LIB overrides the default location
+silkit = ctypes.CDLL(os.environ.get('SILKIT_LIB', '/home/frank/projects/sil-kit/build/Release/libSilKit.so'))
 
 # Keep a global reference to the callback pointer to prevent garbage collection
 _global_frame_handler_ptr = None
@@ -70,7 +69,9 @@ class SilKit_LifecycleConfiguration(Structure):
     ]
 
 # Define CAN frame handler callback type
-FrameHandlerType = ctypes.CFUNCTYPE(None, c_void_p, c_void_p, POINTER(CanFrameEvent))
+# The event arrives as a raw address, viewed with CanFrameEvent.from_address in the
+# handler, so ctypes does not build a pointer object for every received frame
+FrameHandlerType = ctypes.CFUNCTYPE(None, c_void_p, c_void_p, c_void_p)
 
 # Define function signatures
 silkit.SilKit_ParticipantConfiguration_FromString.argtypes = [POINTER(c_void_p), c_char_p]
@@ -110,18 +111,26 @@ silkit.SilKit_CanController_Stop.restype = c_int
 silkit.SilKit_LifecycleService_Stop.argtypes = [c_void_p, c_char_p]
 silkit.SilKit_LifecycleService_Stop.restype = c_int
 
+FRAME_VERSION = (83 << 56) | (75 << 48) | (1 << 40) | (1 << 32) | (1 << 24)  # SK_ID_MAKE(Can, SilKit_CanFrame)
+LIFECYCLE_VERSION = (83 << 56) | (75 << 48) | (7 << 40) | (2 << 32) | (1 << 24)  # SK_ID_MAKE(Participant, SilKit_LifecycleConfiguration)
+
+_STRUCT_VERSIONS = {
+    CanFrame: FRAME_VERSION,
+    SilKit_LifecycleConfiguration: LIFECYCLE_VERSION,
+}
+
 # Define SIL-Kit struct initialization
 def SilKit_Struct_Init(struct_type, struct_instance):
-    memset(byref(struct_instance), 0, sizeof(struct_instance))
-    if struct_type == CanFrame:
-        struct_instance.structHeader.version = ((83 << 56) | (75 << 48) | (1 << 40) | (1 << 32) | (1 << 24))
-    elif struct_type == SilKit_LifecycleConfiguration:
-        struct_instance.structHeader.version = ((83 << 56) | (75 << 48) | (7 << 40) | (2 << 32) | (1 << 24))
+    # Only used on freshly constructed structs, which ctypes already zero-fills
+    struct_instance.structHeader.version = _STRUCT_VERSIONS[struct_type]
 
 # CAN message IDs
 LIGHTING_CONTROL_ID = 0x110
 LIGHTING_STATUS_ID = 0x111
 
+# Time in ms the ECU has to acknowledge a change before it is shown as TIMEOUT
+ACK_TIMEOUT_MS = 1000
+
 # Lighting states
 LIGHT_OFF = 0
 LIGHT_ON = 1
@@ -129,12 +138,23 @@ BLINKER_LEFT = 2
 BLINKER_RIGHT = 3
 HAZARD_LIGHTS = 4
 
-class PendingState(Enum):
-    NONE = 0
-    PENDING = 1
-    TIMEOUT = 2
+# Pending states of a requested change
+PENDING_NONE = 0
+PENDING_PENDING = 1
+PENDING_TIMEOUT = 2
 
 class LightingPanel(QMainWindow):
+    # Status label styles, shared so each colour's QSS string is built only once
+    STYLE_RED = "QLabel { color: red; }"
+    STYLE_ORANGE = "QLabel { color: orange; }"
+    STYLE_GREEN = "QLabel { color: green; }"
+
+    # Status label text and style while a change is unconfirmed
+    PENDING_VIEWS = {
+        PENDING_PENDING: ("PENDING", STYLE_ORANGE),
+        PENDING_TIMEOUT: ("TIMEOUT", STYLE_RED),
+    }
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Lighting Control Panel")
@@ -151,7 +171,7 @@ class LightingPanel(QMainWindow):
         self.participant_name = f"Lighting_Panel_{int(time.time())}".encode('utf-8')
         self.can_network_name = b"CAN1"
         
-        self.logger.info(f"Lighting Panel initializing with name {self.participant_name.decode()}")
+        self.logger.info("Lighting Panel initializing with name %s", self.participant_name.decode())
         
         # Initialize state
         self.headlight_state = LIGHT_OFF
@@ -159,17 +179,15 @@ class LightingPanel(QMainWindow):
         self.hazard_state = LIGHT_OFF
         
         # Initialize pending states
-        self.pending_headlight = PendingState.NONE
-        self.pending_blinker = PendingState.NONE
-        self.pending_hazard = PendingState.NONE
-        
-        # Initialize timeout tracking
-        self.pending_timeout = timedelta(seconds=1)  # 1 second timeout
-        self.pending_timestamps = {
-            'headlight': None,
-            'blinker': None,
-            'hazard': None
-        }
+        self.pending_headlight = PENDING_NONE
+        self.pending_blinker = PENDING_NONE
+        self.pending_hazard = PENDING_NONE
+        
+        # One single-shot timer per pending change, (re)started when a change is sent.
+        # An ACK clears the pending state, so a timer that fires afterwards does nothing
+        self.headlight_timeout_timer = self._make_timeout_timer(self.on_headlight_timeout)
+        self.blinker_timeout_timer = self._make_timeout_timer(self.on_blinker_timeout)
+        self.hazard_timeout_timer = self._make_timeout_timer(self.on_hazard_timeout)
         
         # Track last sent state
         self.last_sent_state = {
@@ -178,35 +196,59 @@ class LightingPanel(QMainWindow):
             'hazard': LIGHT_OFF
         }
         
+        # Persistent TX frame and payload buffer, reused for every control message
+        self._tx_data = (c_uint8 * 3)()
+        self._tx_frame = CanFrame()
+        SilKit_Struct_Init(CanFrame, self._tx_frame)
+        self._tx_frame.id = LIGHTING_CONTROL_ID
+        self._tx_frame.flags = 0
+        self._tx_frame.dlc = 3
+        self._tx_frame.data.data = cast(self._tx_data, POINTER(c_uint8))
+        self._tx_frame.data.size = 3
+        self._tx_frame_ref = byref(self._tx_frame)
+        
+        # Status frames are handed from the SIL-Kit thread to the Qt thread through
+        # rx_queue, with rx_fd signalled per frame. Only the newest status matters
+        self.rx_queue = collections.deque(maxlen=1)
+        self.rx_fd = os.eventfd(0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+        
         # Initialize SIL-Kit
         self.initialize_silkit()
         
         # Create GUI
         self.create_gui()
         
-        # Set up periodic CAN message timer
+        # Coalesce GUI updates: every change schedules one update_gui on the next
+        # event-loop pass, so a burst of changes repaints only once
+        self.gui_update_timer = QTimer(self)
+        self.gui_update_timer.setSingleShot(True)
+        self.gui_update_timer.setInterval(0)
+        self.gui_update_timer.timeout.connect(self.update_gui)
+        self.status_shown = {}
+        
+        # Apply received status frames on the Qt thread whenever the eventfd is signalled
+        self.rx_notifier = QSocketNotifier(self.rx_fd, QSocketNotifier.Type.Read, self)
+        self.rx_notifier.activated.connect(self.process_status_updates)
+        
+        # Set up periodic resend timer, only running while a change is unsent or pending
         self.can_timer = QTimer()
+        self.can_timer.setInterval(2000)  # Resend every 2 seconds
         self.can_timer.timeout.connect(self.send_periodic_update)
-        self.can_timer.start(2000)  # Send every 2 second
-        
-        # Set up timeout check timer
-        self.timeout_timer = QTimer()
-        self.timeout_timer.timeout.connect(self.check_pending_timeouts)
-        self.timeout_timer.start(100)  # Check every 100ms
+
         
         self.logger.info("Lighting Panel initialized successfully")
 
     def initialize_silkit(self):
-        print("Creating participant configuration...")
+        self.logger.debug("Creating participant configuration...")
         # Create participant configuration
         self.participant_config = c_void_p()
         result = silkit.SilKit_ParticipantConfiguration_FromString(byref(self.participant_config), b"{}")
         if result != 0:
             raise RuntimeError(f"Failed to create participant configuration: {result}")
-        print("Participant configuration created.")
+        self.logger.debug("Participant configuration created.")
 
         # Create participant
-        print("Creating participant...")
+        self.logger.debug("Creating participant...")
         self.participant = c_void_p()
         result = silkit.SilKit_Participant_Create(
             byref(self.participant),
@@ -217,16 +259,16 @@ class LightingPanel(QMainWindow):
         if result != 0:
             silkit.SilKit_ParticipantConfiguration_Destroy(self.participant_config)
             raise RuntimeError(f"Failed to create participant: {result}")
-        print("Participant created.")
+        self.logger.debug("Participant created.")
 
         # Create lifecycle configuration
-        print("Creating lifecycle configuration...")
+        self.logger.debug("Creating lifecycle configuration...")
         lifecycle_config = SilKit_LifecycleConfiguration()
         SilKit_Struct_Init(SilKit_LifecycleConfiguration, lifecycle_config)
         lifecycle_config.operationMode = SILKIT_OPERATIONMODE_AUTONOMOUS
 
         # Create lifecycle service
-        print("Creating lifecycle service...")
+        self.logger.debug("Creating lifecycle service...")
         self.lifecycle_service = c_void_p()
         result = silkit.SilKit_LifecycleService_Create(
             byref(self.lifecycle_service),
@@ -237,10 +279,10 @@ class LightingPanel(QMainWindow):
             silkit.SilKit_Participant_Destroy(self.participant)
             silkit.SilKit_ParticipantConfiguration_Destroy(self.participant_config)
             raise RuntimeError(f"Failed to create lifecycle service: {result}")
-        print("Lifecycle service created.")
+        self.logger.debug("Lifecycle service created.")
         
         # Create CAN controller
-        print(f"Creating CAN controller on network {self.can_network_name.decode()}...")
+        self.logger.debug("Creating CAN controller on network %s...", self.can_network_name.decode())
         self.can_controller = c_void_p()
         result = silkit.SilKit_CanController_Create(
             byref(self.can_controller),
@@ -252,19 +294,19 @@ class LightingPanel(QMainWindow):
             silkit.SilKit_Participant_Destroy(self.participant)
             silkit.SilKit_ParticipantConfiguration_Destroy(self.participant_config)
             raise RuntimeError(f"Failed to create CAN controller: {result}")
-        print("CAN controller created.")
+        self.logger.debug("CAN controller created.")
 
         # Set CAN baud rate (500 kbps)
-        print("Setting CAN baud rate...")
+        self.logger.debug("Setting CAN baud rate...")
         result = silkit.SilKit_CanController_SetBaudRate(self.can_controller, 500000, 0, 0)
         if result != 0:
             silkit.SilKit_Participant_Destroy(self.participant)
             silkit.SilKit_ParticipantConfiguration_Destroy(self.participant_config)
             raise RuntimeError(f"Failed to set CAN baud rate: {result}")
-        print("CAN baud rate set.")
+        self.logger.debug("CAN baud rate set.")
 
         # Add CAN frame handler
-        print("Adding CAN frame handler...")
+        self.logger.debug("Adding CAN frame handler...")
         self.handler_id = c_uint32()
         global _global_frame_handler_ptr
         self.frame_handler_callback = FrameHandlerType(self.handle_can_frame)
@@ -281,25 +323,28 @@ class LightingPanel(QMainWindow):
             silkit.SilKit_Participant_Destroy(self.participant)
             silkit.SilKit_ParticipantConfiguration_Destroy(self.participant_config)
             raise RuntimeError(f"Failed to add CAN handler: {result}")
-        print(f"CAN frame handler added with ID: {self.handler_id.value}")
+        self.logger.debug("CAN frame handler added with ID: %d", self.handler_id.value)
 
         # Start CAN controller
-        print("Starting CAN controller...")
+        self.logger.debug("Starting CAN controller...")
         result = silkit.SilKit_CanController_Start(self.can_controller)
         if result != 0:
             silkit.SilKit_Participant_Destroy(self.participant)
             silkit.SilKit_ParticipantConfiguration_Destroy(self.participant_config)
             raise RuntimeError(f"Failed to start CAN controller: {result}")
-        print("CAN controller started.")
+        self.logger.debug("CAN controller started.")
 
         # Start lifecycle service
-        print("Starting lifecycle service...")
+        self.logger.debug("Starting lifecycle service...")
         result = silkit.SilKit_LifecycleService_StartLifecycle(self.lifecycle_service)
         if result != 0:
             silkit.SilKit_Participant_Destroy(self.participant)
             silkit.SilKit_ParticipantConfiguration_Destroy(self.participant_config)
             raise RuntimeError(f"Failed to start lifecycle service: {result}")
-        print("Lifecycle service started.")
+        self.logger.debug("Lifecycle service started.")
+        self.logger.info("SIL-Kit initialized: participant=%s network=%s handler=%d",
+                         self.participant_name.decode(), self.can_network_name.decode(),
+                         self.handler_id.value)
 
     def create_gui(self):
         # Main widget and layout
@@ -375,7 +420,7 @@ class LightingPanel(QMainWindow):
         headlight_status = QHBoxLayout()
         headlight_status.addWidget(QLabel("Headlights:"))
         self.headlight_status = QLabel("OFF")
-        self.headlight_status.setStyleSheet("QLabel { color: red; }")
+        self.headlight_status.setStyleSheet(self.STYLE_RED)
         headlight_status.addWidget(self.headlight_status)
         headlight_status.addStretch()
         status_layout.addLayout(headlight_status)
@@ -384,7 +429,7 @@ class LightingPanel(QMainWindow):
         blinker_status = QHBoxLayout()
         blinker_status.addWidget(QLabel("Blinkers:"))
         self.blinker_status = QLabel("OFF")
-        self.blinker_status.setStyleSheet("QLabel { color: red; }")
+        self.blinker_status.setStyleSheet(self.STYLE_RED)
         blinker_status.addWidget(self.blinker_status)
         blinker_status.addStretch()
         status_layout.addLayout(blinker_status)
@@ -393,7 +438,7 @@ class LightingPanel(QMainWindow):
         hazard_status = QHBoxLayout()
         hazard_status.addWidget(QLabel("Hazard Lights:"))
         self.hazard_status = QLabel("OFF")
-        self.hazard_status.setStyleSheet("QLabel { color: red; }")
+        self.hazard_status.setStyleSheet(self.STYLE_RED)
         hazard_status.addWidget(self.hazard_status)
         hazard_status.addStretch()
         status_layout.addLayout(hazard_status)
@@ -414,228 +459,219 @@ class LightingPanel(QMainWindow):
         status_group.setLayout(status_layout)
         layout.addWidget(status_group)
         
+        # Radio button, status text and style shown for each confirmed state.
+        # Unknown states are shown like OFF
+        self.headlight_views = {
+            LIGHT_OFF: (self.headlight_off, "OFF", self.STYLE_RED),
+            LIGHT_ON: (self.headlight_on, "ON", self.STYLE_GREEN),
+        }
+        self.blinker_views = {
+            LIGHT_OFF: (self.blinker_off, "OFF", self.STYLE_RED),
+            BLINKER_LEFT: (self.blinker_left, "LEFT", self.STYLE_ORANGE),
+            BLINKER_RIGHT: (self.blinker_right, "RIGHT", self.STYLE_ORANGE),
+        }
+        self.hazard_views = {
+            LIGHT_OFF: (self.hazard_off, "OFF", self.STYLE_RED),
+            HAZARD_LIGHTS: (self.hazard_on, "ON", self.STYLE_ORANGE),
+        }
+        
         # Connect signals
         self.headlight_group.buttonClicked.connect(self.on_headlight_change)
         self.blinker_group.buttonClicked.connect(self.on_blinker_change)
         self.hazard_group.buttonClicked.connect(self.on_hazard_change)
         
-        # Set up blinker animation timer
+        # Set up blinker animation timer, only running while a blinker or the hazard lights are on
         self.blinker_timer = QTimer()
+        self.blinker_timer.setInterval(500)  # 500ms interval for blinking
         self.blinker_timer.timeout.connect(self.update_blinker_indicator)
-        self.blinker_timer.start(500)  # 500ms interval for blinking
 
-    def check_pending_timeouts(self):
-        current_time = datetime.now()
-        
-        # Check headlight timeout
-        if (self.pending_headlight == PendingState.PENDING and 
-            self.pending_timestamps['headlight'] and 
-            current_time - self.pending_timestamps['headlight'] > self.pending_timeout):
+    def _make_timeout_timer(self, on_timeout):
+        timer = QTimer(self)
+        timer.setSingleShot(True)
+        timer.setInterval(ACK_TIMEOUT_MS)
+        timer.timeout.connect(on_timeout)
+        return timer
+
+    def on_headlight_timeout(self):
+        if self.pending_headlight == PENDING_PENDING:
             self.logger.warning("Headlight change timeout")
-            self.pending_headlight = PendingState.TIMEOUT
-            self.update_gui()
-            
-        # Check blinker timeout
-        if (self.pending_blinker == PendingState.PENDING and 
-            self.pending_timestamps['blinker'] and 
-            current_time - self.pending_timestamps['blinker'] > self.pending_timeout):
+            self.pending_headlight = PENDING_TIMEOUT
+            self.gui_update_timer.start()
+
+    def on_blinker_timeout(self):
+        if self.pending_blinker == PENDING_PENDING:
             self.logger.warning("Blinker change timeout")
-            self.pending_blinker = PendingState.TIMEOUT
-            self.update_gui()
-            
-        # Check hazard timeout
-        if (self.pending_hazard == PendingState.PENDING and 
-            self.pending_timestamps['hazard'] and 
-            current_time - self.pending_timestamps['hazard'] > self.pending_timeout):
+            self.pending_blinker = PENDING_TIMEOUT
+            self.gui_update_timer.start()
+
+    def on_hazard_timeout(self):
+        if self.pending_hazard == PENDING_PENDING:
             self.logger.warning("Hazard change timeout")
-            self.pending_hazard = PendingState.TIMEOUT
-            self.update_gui()
+            self.pending_hazard = PENDING_TIMEOUT
+            self.gui_update_timer.start()
 
     def update_blinker_indicator(self):
-        # Only show blinking indicator if the state is confirmed (not pending)
-        if self.pending_blinker == PendingState.NONE and self.pending_hazard == PendingState.NONE:
-            if self.hazard_state:
-                # Hazard lights override blinkers
-                self.blinker_indicator.setVisible(not self.blinker_indicator.isVisible())
-            elif self.blinker_state == BLINKER_LEFT:
-                # Left blinker
-                self.blinker_indicator.setVisible(not self.blinker_indicator.isVisible())
-            elif self.blinker_state == BLINKER_RIGHT:
-                # Right blinker
-                self.blinker_indicator.setVisible(not self.blinker_indicator.isVisible())
-            else:
-                # No blinking state active
-                self.blinker_indicator.hide()
+        self.blinker_indicator.setVisible(not self.blinker_indicator.isVisible())
+
+    def _show_status(self, label, text, style):
+        # Skip the relayout and style recomputation when the label already shows this
+        shown = (text, style)
+        if self.status_shown.get(label) != shown:
+            self.status_shown[label] = shown
+            label.setText(text)
+            label.setStyleSheet(style)
+
+    def _update_status(self, label, pending, views, state):
+        if pending != PENDING_NONE:
+            text, style = self.PENDING_VIEWS[pending]
         else:
-            # Hide indicator if state is pending
-            self.blinker_indicator.hide()
+            button, text, style = views.get(state) or views[LIGHT_OFF]
+            button.setChecked(True)
+        self._show_status(label, text, style)
 
     def update_gui(self):
         # Update radio buttons and status labels
-        if self.pending_headlight == PendingState.PENDING:
-            self.headlight_status.setText("PENDING")
-            self.headlight_status.setStyleSheet("QLabel { color: orange; }")
-        elif self.pending_headlight == PendingState.TIMEOUT:
-            self.headlight_status.setText("TIMEOUT")
-            self.headlight_status.setStyleSheet("QLabel { color: red; }")
-        else:
-            if self.headlight_state == LIGHT_ON:
-                self.headlight_on.setChecked(True)
-                self.headlight_status.setText("ON")
-                self.headlight_status.setStyleSheet("QLabel { color: green; }")
-            else:
-                self.headlight_off.setChecked(True)
-                self.headlight_status.setText("OFF")
-                self.headlight_status.setStyleSheet("QLabel { color: red; }")
-        
-        if self.pending_blinker == PendingState.PENDING:
-            self.blinker_status.setText("PENDING")
-            self.blinker_status.setStyleSheet("QLabel { color: orange; }")
-        elif self.pending_blinker == PendingState.TIMEOUT:
-            self.blinker_status.setText("TIMEOUT")
-            self.blinker_status.setStyleSheet("QLabel { color: red; }")
-        else:
-            if self.blinker_state == BLINKER_LEFT:
-                self.blinker_left.setChecked(True)
-                self.blinker_status.setText("LEFT")
-                self.blinker_status.setStyleSheet("QLabel { color: orange; }")
-            elif self.blinker_state == BLINKER_RIGHT:
-                self.blinker_right.setChecked(True)
-                self.blinker_status.setText("RIGHT")
-                self.blinker_status.setStyleSheet("QLabel { color: orange; }")
-            else:
-                self.blinker_off.setChecked(True)
-                self.blinker_status.setText("OFF")
-                self.blinker_status.setStyleSheet("QLabel { color: red; }")
-        
-        if self.pending_hazard == PendingState.PENDING:
-            self.hazard_status.setText("PENDING")
-            self.hazard_status.setStyleSheet("QLabel { color: orange; }")
-        elif self.pending_hazard == PendingState.TIMEOUT:
-            self.hazard_status.setText("TIMEOUT")
-            self.hazard_status.setStyleSheet("QLabel { color: red; }")
-        else:
-            if self.hazard_state == HAZARD_LIGHTS:
-                self.hazard_on.setChecked(True)
-                self.hazard_status.setText("ON")
-                self.hazard_status.setStyleSheet("QLabel { color: orange; }")
-            else:
-                self.hazard_off.setChecked(True)
-                self.hazard_status.setText("OFF")
-                self.hazard_status.setStyleSheet("QLabel { color: red; }")
+        self._update_status(self.headlight_status, self.pending_headlight, self.headlight_views, self.headlight_state)
+        self._update_status(self.blinker_status, self.pending_blinker, self.blinker_views, self.blinker_state)
+        self._update_status(self.hazard_status, self.pending_hazard, self.hazard_views, self.hazard_state)
+        
+        # Only blink once the state is confirmed (not pending); hazard lights override blinkers
+        if (self.pending_blinker == PENDING_NONE and self.pending_hazard == PENDING_NONE and
+                (self.hazard_state or self.blinker_state in (BLINKER_LEFT, BLINKER_RIGHT))):
+            if not self.blinker_timer.isActive():
+                self.blinker_timer.start()
+        elif self.blinker_timer.isActive():
+            self.blinker_timer.stop()
+            self.blinker_indicator.hide()
 
     def handle_can_frame(self, context, controller, frame_event):
-        if not frame_event or not frame_event.contents.frame:
+        # This function is called from a SIL-Kit internal thread: it only copies the
+        # status into rx_queue, process_status_updates applies it on the Qt thread
+        if not frame_event:
+            return
+        event = CanFrameEvent.from_address(frame_event)
+        if not event.frame:
             return
         
-        frame = frame_event.contents.frame.contents
+        frame = event.frame.contents
         if frame.id == LIGHTING_STATUS_ID:
-            # Update state from received message
-            data = [frame.data.data[i] for i in range(frame.data.size)]
+            data = string_at(frame.data.data, frame.data.size) if frame.data.data else b''
             if len(data) >= 3:
-                # Clear pending and timeout states
-                if self.pending_headlight != PendingState.NONE:
-                    self.pending_headlight = PendingState.NONE
-                    self.pending_timestamps['headlight'] = None
-                
-                if self.pending_blinker != PendingState.NONE:
-                    self.pending_blinker = PendingState.NONE
-                    self.pending_timestamps['blinker'] = None
-                
-                if self.pending_hazard != PendingState.NONE:
-                    self.pending_hazard = PendingState.NONE
-                    self.pending_timestamps['hazard'] = None
-                
-                # Update states to match ECU
-                self.headlight_state = data[0]
-                self.blinker_state = data[1]
-                self.hazard_state = data[2]
-                
-                self.logger.info(f"Received status update: headlight={data[0]}, blinker={data[1]}, hazard={data[2]}")
-                
-                # Update GUI
-                self.update_gui()
+                self.rx_queue.append(data)
+                os.eventfd_write(self.rx_fd, 1)
+
+    def process_status_updates(self):
+        # Reset the eventfd counter first, so a status queued while applying wakes us again
+        try:
+            os.eventfd_read(self.rx_fd)
+        except BlockingIOError:
+            pass
+        
+        try:
+            data = self.rx_queue.popleft()
+        except IndexError:
+            return
+        
+        # Clear pending and timeout states
+        self.pending_headlight = PENDING_NONE
+        self.pending_blinker = PENDING_NONE
+        self.pending_hazard = PENDING_NONE
+        
+        # Update states to match ECU
+        self.headlight_state = data[0]
+        self.blinker_state = data[1]
+        self.hazard_state = data[2]
+        
+        self.logger.info("Received status update: headlight=%d, blinker=%d, hazard=%d", data[0], data[1], data[2])
+        
+        # Update GUI
+        self.gui_update_timer.start()
 
     def send_periodic_update(self):
-        """Send periodic update if state has changed or if there are pending changes"""
-        self.logger.info("Periodic update check")
-        self.logger.info(f"Current state: headlight={self.headlight_state}, blinker={self.blinker_state}, hazard={self.hazard_state}")
-        self.logger.info(f"Last sent state: headlight={self.last_sent_state['headlight']}, blinker={self.last_sent_state['blinker']}, hazard={self.last_sent_state['hazard']}")
-        self.logger.info(f"Pending states: headlight={self.pending_headlight}, blinker={self.pending_blinker}, hazard={self.pending_hazard}")
-        
-        if (self.headlight_state != self.last_sent_state['headlight'] or
-            self.blinker_state != self.last_sent_state['blinker'] or
-            self.hazard_state != self.last_sent_state['hazard'] or
-            self.pending_headlight == PendingState.PENDING or
-            self.pending_blinker == PendingState.PENDING or
-            self.pending_hazard == PendingState.PENDING):
-            
-            self.logger.info("State change detected, sending update")
-            if self.send_control_message():
-                self.last_sent_state = {
-                    'headlight': self.headlight_state,
-                    'blinker': self.blinker_state,
-                    'hazard': self.hazard_state
-                }
-                self.logger.info("Periodic update sent successfully")
-        else:
-            self.logger.info("No state change, skipping update")
-
-    def send_control_message(self):
-        # Create and initialize CAN frame
-        frame = CanFrame()
-        SilKit_Struct_Init(CanFrame, frame)
+        """Resend while a change is unsent or pending; stop the timer once everything is settled"""
+        if (self.headlight_state == self.last_sent_state['headlight'] and
+            self.blinker_state == self.last_sent_state['blinker'] and
+            self.hazard_state == self.last_sent_state['hazard'] and
+            self.pending_headlight != PENDING_PENDING and
+            self.pending_blinker != PENDING_PENDING and
+            self.pending_hazard != PENDING_PENDING):
+            self.can_timer.stop()
+            return
         
-        # Set frame properties
-        frame.id = LIGHTING_CONTROL_ID
-        frame.flags = 0
-        frame.dlc = 3
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Current state: headlight=%s, blinker=%s, hazard=%s",
+                              self.headlight_state, self.blinker_state, self.hazard_state)
+            self.logger.debug("Last sent state: headlight=%s, blinker=%s, hazard=%s",
+                              self.last_sent_state['headlight'], self.last_sent_state['blinker'],
+                              self.last_sent_state['hazard'])
+            self.logger.debug("Pending states: headlight=%s, blinker=%s, hazard=%s",
+                              self.pending_headlight, self.pending_blinker, self.pending_hazard)
         
-        # Create data array
-        data = (c_uint8 * 3)(self.headlight_state, self.blinker_state, self.hazard_state)
-        frame.data.data = cast(data, POINTER(c_uint8))
-        frame.data.size = 3
+        if self.send_control_message():
+            self.logger.debug("Periodic update sent successfully")
+
+    def send_control_message(self):
+        # Fill the persistent frame's payload
+        data = self._tx_data
+        data[0] = self.headlight_state
+        data[1] = self.blinker_state
+        data[2] = self.hazard_state
         
         # Send frame
-        result = silkit.SilKit_CanController_SendFrame(self.can_controller, byref(frame), None)
+        result = silkit.SilKit_CanController_SendFrame(self.can_controller, self._tx_frame_ref, None)
         if result != 0:
-            self.logger.error(f"Failed to send CAN frame: {result}")
+            self.logger.error("Failed to send CAN frame: %d", result)
             return False
         
-        self.logger.info(f"Sent control message: headlight={self.headlight_state}, blinker={self.blinker_state}, hazard={self.hazard_state}")
+        last_sent = self.last_sent_state
+        last_sent['headlight'] = self.headlight_state
+        last_sent['blinker'] = self.blinker_state
+        last_sent['hazard'] = self.hazard_state
+        
+        self.logger.info("Sent control message: headlight=%d, blinker=%d, hazard=%d",
+                         self.headlight_state, self.blinker_state, self.hazard_state)
         return True
 
     def on_headlight_change(self, button):
         new_state = self.headlight_group.id(button)
         if new_state != self.headlight_state:
             self.headlight_state = new_state
-            self.pending_headlight = PendingState.PENDING
-            self.pending_timestamps['headlight'] = datetime.now()
+            self.pending_headlight = PENDING_PENDING
+            self.headlight_timeout_timer.start()
+            self.can_timer.start()
             if self.send_control_message():
-                self.update_gui()
+                self.gui_update_timer.start()
 
     def on_blinker_change(self, button):
         new_state = self.blinker_group.id(button)
         if new_state != self.blinker_state:
             self.blinker_state = new_state
-            self.pending_blinker = PendingState.PENDING
-            self.pending_timestamps['blinker'] = datetime.now()
+            self.pending_blinker = PENDING_PENDING
+            self.blinker_timeout_timer.start()
+            self.can_timer.start()
             if self.send_control_message():
-                self.update_gui()
+                self.gui_update_timer.start()
 
     def on_hazard_change(self, button):
         new_state = self.hazard_group.id(button)
         if new_state != self.hazard_state:
             self.hazard_state = new_state
-            self.pending_hazard = PendingState.PENDING
-            self.pending_timestamps['hazard'] = datetime.now()
+            self.pending_hazard = PENDING_PENDING
+            self.hazard_timeout_timer.start()
+            self.can_timer.start()
             if self.send_control_message():
-                self.update_gui()
+                self.gui_update_timer.start()
 
     def closeEvent(self, event):
         # Stop timers
         self.can_timer.stop()
-        self.timeout_timer.stop()
+        self.headlight_timeout_timer.stop()
+        self.blinker_timeout_timer.stop()
+        self.hazard_timeout_timer.stop()
+        
+        # SIL-Kit threads may still signal rx_fd until the process exits, so it
+        # is left open and only its notifier is disabled
+        self.rx_notifier.setEnabled(False)
         
         # Stop CAN controller
         silkit.SilKit_CanController_Stop(self.can_controller)
@@ -2,6 +2,12 @@ import socket
 import time
 import struct
 import argparse
+import selectors
+import errno
+import os
+import logging
+
+logger = logging.getLogger('TelematicsTest')
 
 # --- Configuration ---
 # CAN IDs from zephyr-apps/common/net/can_ids.h
@@ -15,41 +21,55 @@ DEFAULT_HOST = "192.0.2.3"
 DEFAULT_PORT = 8080  # Must match CONFIG_TELEMATICS_PORT in prj.conf
 RECEIVE_TIMEOUT = 5.0  # Seconds to wait for a specific status message
 STATUS_CHECK_INTERVAL = 0.5 # Seconds between checking status
+CONNECT_TIMEOUT = 5.0 # Seconds to wait for the TCP connection to the gateway
+STEADY_STATE_TIMEOUT = 2.0 # Seconds to wait for the AC state to settle between tests
+RX_BUFFER_SIZE = 65536 # Bytes of received TCP data buffered while checking status
+SOCKET_RCVBUF_SIZE = 262144 # Kernel socket receive buffer requested for the gateway connection
+
+# Frame header: CAN ID (4 bytes, big-endian), DLC (1 byte)
+_HDR = struct.Struct('>IB')
+# Header followed by an 8-byte payload, which is skipped
+_FRAME8 = struct.Struct('>IB8x')
 
 def encode_can_message(can_id, data):
     """Encodes a CAN message for transmission over TCP."""
     dlc = len(data)
     if dlc > 8:
         raise ValueError("CAN data length cannot exceed 8 bytes")
-    # Pack CAN ID (4 bytes, big-endian), DLC (1 byte)
-    header = struct.pack('>IB', can_id, dlc)
-    return header + bytes(data)
-
-def decode_can_message(tcp_data):
-    """Decodes a CAN message received over TCP.
-    Returns (can_id, dlc, data_payload, remaining_tcp_data).
-    If a full message cannot be decoded, can_id will be None, 
-    and remaining_tcp_data will be the original tcp_data passed in.
+    # Header and payload are written into one buffer, without intermediate objects
+    message = bytearray(5 + dlc)
+    _HDR.pack_into(message, 0, can_id, dlc)
+    message[5:] = data
+    return message
+
+def iter_can_frames(tcp_data):
+    """Decodes the header of every complete CAN message at the start of the TCP data.
+    Returns ([(can_id, dlc, payload_offset), ...], consumed), where payload_offset
+    locates the message's data in tcp_data and consumed is the number of bytes decoded;
+    a trailing partial message is left for the next read. Payloads are not copied,
+    callers only read the ones they are interested in.
     """
+    end = len(tcp_data)
+    off = 0
+    frames = []
+    # Fast path: a burst that starts with 8-byte frames (the usual case for periodic
+    # status messages) has all those headers parsed in a single iter_unpack call
+    n = end // _FRAME8.size
+    if n and bytes(tcp_data[4:n * _FRAME8.size:_FRAME8.size]).count(8) == n:
+        frames = [(can_id, dlc, k * _FRAME8.size + 5)
+                  for k, (can_id, dlc) in enumerate(_FRAME8.iter_unpack(tcp_data[:n * _FRAME8.size]))]
+        off = n * _FRAME8.size
+    unpack_hdr = _HDR.unpack_from
+    append = frames.append
     # Minimum length for header (ID 4 bytes + DLC 1 byte)
-    if len(tcp_data) < 5:
-        return None, None, None, tcp_data
-    
-    can_id, dlc = struct.unpack('>IB', tcp_data[:5])
-    
-    # Expected length of the CAN message payload based on DLC
-    expected_payload_len = dlc # dlc itself is the count of data bytes
-    # Total expected length for this single CAN frame in the tcp_data
-    expected_frame_len = 5 + expected_payload_len
-
-    if len(tcp_data) < expected_frame_len:
-        # Not enough data for the complete frame (header + payload)
-        return None, None, None, tcp_data
-
-    # If we have enough data, extract the payload and the remainder of the tcp_data
-    data_payload = tcp_data[5:expected_frame_len]
-    remaining_tcp_data = tcp_data[expected_frame_len:]
-    return can_id, dlc, data_payload, remaining_tcp_data
+    while end - off >= 5:
+        can_id, dlc = unpack_hdr(tcp_data, off)
+        # dlc itself is the count of data bytes following the header
+        if end - off < 5 + dlc:
+            break # Not enough data for the complete frame (header + payload)
+        append((can_id, dlc, off + 5))
+        off += 5 + dlc
+    return frames, off
 
 def send_ac_command(sock, state):
     """Sends an AC power command (ON/OFF) via the telematics gateway."""
@@ -65,47 +85,97 @@ def send_ac_command(sock, state):
         return False
     return True
 
-def check_hvac_status(sock, expected_ac_state, timeout=RECEIVE_TIMEOUT):
+class CanStreamReader:
+    """Receive buffer and decoder for one gateway connection.
+    Every status check reads through the same reader, so bytes left over when one check
+    returns (including a partial message) are decoded by the next one.
+    """
+    def __init__(self, sock):
+        self.sock = sock
+        # Receive buffer, filled by recv_into: rx[r:w] holds data not yet decoded,
+        # potentially multiple/partial messages
+        self.rx = bytearray(RX_BUFFER_SIZE)
+        self.mv = memoryview(self.rx)
+        self.r = self.w = 0
+
+    def frames(self, timeout):
+        """Yields (can_id, dlc, data_payload) for each CAN message received until timeout expires.
+        data_payload is a memoryview into the receive buffer, only valid until the next
+        message is requested. Raises EOFError if the server closes the connection.
+        """
+        sock = self.sock
+        mv = self.mv
+        # Monotonic, so clock adjustments cannot stretch or cut short the wait
+        mono = time.monotonic
+        deadline = mono() + timeout
+
+        # Sleep in the selector until the socket is readable or the timeout expires,
+        # instead of polling recv with a short timeout
+        sel = selectors.DefaultSelector()
+        sel.register(sock, selectors.EVENT_READ)
+        sock.setblocking(False)
+        # Bound once, the loop below runs for every read
+        select = sel.select
+        recv_into = sock.recv_into
+        setsockopt = sock.setsockopt
+        tcp_quickack = getattr(socket, 'TCP_QUICKACK', None)
+        try:
+            while True:
+                # Hand out all complete CAN messages currently in the buffer, starting
+                # with those left over from a previous call
+                base = self.r
+                pending = mv[base:self.w]
+                frames, consumed = iter_can_frames(pending)
+                for can_id, dlc, payload_off in frames:
+                    # Mark the message as read first, so a caller that stops here
+                    # does not see it again and the next call resumes after it
+                    self.r = base + payload_off + dlc
+                    yield can_id, dlc, pending[payload_off:payload_off + dlc]
+                self._compact()
+
+                remaining = deadline - mono()
+                if remaining <= 0 or not select(remaining):
+                    return # Timed out waiting for data
+                try:
+                    n = recv_into(mv[self.w:]) # Read what the kernel reported as available
+                except BlockingIOError:
+                    continue # Spurious wakeup, nothing to read after all
+                if not n:
+                    raise EOFError("connection closed by server")
+                self.w += n
+                # Linux re-arms delayed ACKs after reads, ACK immediately instead
+                if tcp_quickack is not None:
+                    setsockopt(socket.IPPROTO_TCP, tcp_quickack, 1)
+        finally:
+            sel.close()
+            sock.setblocking(True) # Reset socket to blocking mode before handing it back
+
+    def _compact(self):
+        # Keep any partial message for the next recv
+        r, w = self.r, self.w
+        if r == w:
+            self.r = self.w = 0
+        elif r > RX_BUFFER_SIZE // 2:
+            # Move the partial message to the front to make room for the next read
+            self.rx[:w - r] = self.rx[r:w]
+            self.w = w - r
+            self.r = 0
+
+def check_hvac_status(reader, expected_ac_state, timeout=RECEIVE_TIMEOUT):
     """Checks for HVAC status message and verifies the AC state.
     Continuously checks for messages until the expected state is found or timeout occurs.
     """
-    start_time = time.time()
-    buffer = b'' # Holds data received from socket, potentially multiple/partial messages
     last_seen_incorrect_state = None
 
     print(f"Waiting for HVAC Status (ID: 0x{HVAC_STATUS_ID_TO_CHECK:X}) with AC state = {expected_ac_state} for up to {timeout:.1f}s...")
 
-    while time.time() - start_time < timeout:
-        loop_iteration_start_time = time.time()
-        try:
-            # Set a short timeout for individual recv attempts
-            # This allows the loop to be responsive and check the main timeout condition
-            sock.settimeout(0.05) # 50ms timeout for this recv call
-            chunk = sock.recv(128) # Attempt to read some data
-            if not chunk:
-                print("  Connection closed by server during status check.")
-                return False # Connection lost
-            buffer += chunk
-        except socket.timeout:
-            # This is an expected timeout for a single recv attempt if no new data arrived quickly.
-            # The outer loop will continue until the main `timeout` is reached.
-            pass 
-        except socket.error as e:
-            print(f"  Error receiving data: {e}")
-            return False # Unrecoverable socket error
-
-        # Process all complete CAN messages currently in the buffer
-        while True: # Inner loop to consume all messages from the current buffer
-            can_id, dlc, data_payload, remaining_buffer_after_decode = decode_can_message(buffer)
-            
-            if can_id is None: # Indicates a full message could not be decoded
-                buffer = remaining_buffer_after_decode # Store the partial message back
-                break # Exit inner loop, need more data from sock.recv()
-
-            # A message was successfully decoded, update buffer for next inner loop iteration
-            buffer = remaining_buffer_after_decode 
-
-            print(f"  Received Raw - ID: 0x{can_id:X}, DLC: {dlc}, Data: {list(data_payload)}")
+    # Every received frame is only logged with --verbose, so check the level once
+    log_raw = logger.isEnabledFor(logging.DEBUG)
+    frames = reader.frames(timeout)
+    try:
+        for can_id, dlc, data_payload in frames:
+            if log_raw:
+                logger.debug("Received Raw - ID: 0x%X, DLC: %d, Data: %s", can_id, dlc, list(data_payload))
 
             if can_id == HVAC_STATUS_ID_TO_CHECK:
                 if dlc > AC_STATE_BYTE_INDEX:
@@ -113,7 +183,6 @@ def check_hvac_status(sock, expected_ac_state, timeout=RECEIVE_TIMEOUT):
                     print(f"  HVAC Status (0x{can_id:X}) found. Actual AC state: {actual_ac_state}. Expected: {expected_ac_state}.")
                     if actual_ac_state == expected_ac_state:
                         print("  Correct AC state confirmed.")
-                        sock.settimeout(None) # Reset socket to blocking mode (or original state)
                         return True # SUCCESS!
                     else:
                         last_seen_incorrect_state = actual_ac_state
@@ -122,53 +191,111 @@ def check_hvac_status(sock, expected_ac_state, timeout=RECEIVE_TIMEOUT):
                     print(f"  HVAC Status (0x{can_id:X}) too short (DLC={dlc}) for AC state byte.")
             # else: # Optionally log other CAN IDs received if needed for debugging
             #     print(f"  Ignoring message ID 0x{can_id:X}.")
-        
-        # Small sleep to prevent outer loop from spinning too fast if recv keeps timing out
-        # and buffer is empty. Ensures other OS tasks can run.
-        elapsed_in_loop_iteration = time.time() - loop_iteration_start_time
-        if elapsed_in_loop_iteration < 0.05: # If loop was faster than typical socket timeout
-            time.sleep(0.05 - elapsed_in_loop_iteration) 
-
-    sock.settimeout(None) # Reset socket to blocking mode (or original state) before exiting function
+    except EOFError:
+        print("  Connection closed by server during status check.")
+        return False # Connection lost
+    except socket.error as e:
+        print(f"  Error receiving data: {e}")
+        return False # Unrecoverable socket error
+    finally:
+        frames.close()
+
     if last_seen_incorrect_state is not None:
         print(f"Timeout: Expected HVAC status (ID 0x{HVAC_STATUS_ID_TO_CHECK:X}, state {expected_ac_state}) not received. Last incorrect state seen was {last_seen_incorrect_state}.")
     else:
         print(f"Timeout: Did not receive any matching HVAC status (ID 0x{HVAC_STATUS_ID_TO_CHECK:X}) within {timeout:.1f} seconds.")
     return False
 
+def wait_for_steady_state(reader, expected_ac_state, consecutive=2, timeout=STEADY_STATE_TIMEOUT):
+    """Waits until `consecutive` HVAC status messages in a row report the expected AC state.
+    Returns False if that does not happen within timeout.
+    """
+    matches = 0
+    frames = reader.frames(timeout)
+    try:
+        for can_id, dlc, data_payload in frames:
+            if can_id == HVAC_STATUS_ID_TO_CHECK and dlc > AC_STATE_BYTE_INDEX:
+                if data_payload[AC_STATE_BYTE_INDEX] == expected_ac_state:
+                    matches += 1
+                    if matches >= consecutive:
+                        return True
+                else:
+                    matches = 0
+    except (EOFError, socket.error) as e:
+        print(f"  Error while waiting for steady state: {e}")
+    finally:
+        frames.close()
+    return False
+
+
+def connect_with_timeout(host, port, timeout):
+    """Connects a TCP socket, waiting for the connection in a selector for up to timeout seconds.
+    Returns the connected socket in blocking mode; raises socket.timeout or socket.error.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        # Size the kernel receive buffer for a burst of frames. Set before connecting,
+        # since the TCP window scale is negotiated in the handshake
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_RCVBUF_SIZE)
+        sock.setblocking(False)
+        err = sock.connect_ex((host, port))
+        if err == errno.EINPROGRESS:
+            # The connection completes (or fails) once the socket becomes writable
+            with selectors.DefaultSelector() as sel:
+                sel.register(sock, selectors.EVENT_WRITE)
+                if not sel.select(timeout):
+                    raise socket.timeout("timed out")
+            err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if err:
+            raise OSError(err, os.strerror(err))
+        sock.setblocking(True)
+        return sock
+    except BaseException:
+        sock.close()
+        raise
 
 def main(host, port):
     """Main test function."""
     print(f"Connecting to Telematics Gateway at {host}:{port}...")
     test_socket = None # Define socket variable outside try to use in finally
     try:
-        # It's better to manage the socket explicitly if we are setting timeouts frequently
-        test_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        test_socket.settimeout(5) # Connection timeout
-        test_socket.connect((host, port))
-        print("Connected.")
-        test_socket.settimeout(None) # Set back to blocking for sendall, or specific for check_hvac_status
+        test_socket = connect_with_timeout(host, port, CONNECT_TIMEOUT)
+        # The kernel doubles the requested size and clamps it to net.core.rmem_max
+        print(f"Connected. Receive buffer: {test_socket.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)} bytes")
+        # Each command is a small request/response exchange: send it without waiting on Nagle
+        test_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # Busy-poll the NIC for up to 50us on reads. Values above net.core.busy_poll
+        # need CAP_NET_ADMIN, so this is best effort (sysctl net.core.busy_poll=50)
+        so_busy_poll = getattr(socket, 'SO_BUSY_POLL', None)
+        if so_busy_poll is not None:
+            try:
+                test_socket.setsockopt(socket.SOL_SOCKET, so_busy_poll, 50)
+            except OSError as e:
+                print(f"SO_BUSY_POLL not enabled: {e}")
+        # One receive buffer for the whole connection, shared by every status check
+        reader = CanStreamReader(test_socket)
 
         # --- Test AC ON ---
         if not send_ac_command(test_socket, True):
                  return
         # time.sleep(STATUS_CHECK_INTERVAL) # Give ECU time to process - check_hvac_status now has its own polling
-        if check_hvac_status(test_socket, 1, timeout=RECEIVE_TIMEOUT):
+        if check_hvac_status(reader, 1, timeout=RECEIVE_TIMEOUT):
             print("--> AC ON Test: SUCCESS")
         else:
             print("--> AC ON Test: FAILED")
             return # Stop if first test fails
 
         print("-" * 20)
-        # time.sleep(5) # Pause between tests - can be shorter if desired
-        print("Pausing for 2 seconds before AC OFF test...")
-        time.sleep(2) 
+        # Proceed as soon as the ECU keeps reporting AC ON, instead of a fixed pause
+        print(f"Waiting up to {STEADY_STATE_TIMEOUT:.1f}s for AC ON to settle before AC OFF test...")
+        if not wait_for_steady_state(reader, 1):
+            print("AC ON did not settle, continuing with AC OFF test.")
 
         # --- Test AC OFF ---
         if not send_ac_command(test_socket, False):
             return
         # time.sleep(STATUS_CHECK_INTERVAL) # Give ECU time to process - check_hvac_status now has its own polling
-        if check_hvac_status(test_socket, 0, timeout=RECEIVE_TIMEOUT):
+        if check_hvac_status(reader, 0, timeout=RECEIVE_TIMEOUT):
             print("--> AC OFF Test: SUCCESS")
         else:
             print("--> AC OFF Test: FAILED")
@@ -189,6 +316,11 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Test Telematics Gateway and HVAC ECU via TCP.")
     parser.add_argument("--host", default=DEFAULT_HOST, help=f"Telematics Gateway IP address (default: {DEFAULT_HOST})")
     parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Telematics Gateway TCP port (default: {DEFAULT_PORT})")
+    parser.add_argument("--verbose", action="store_true", help="Log every received CAN frame")
     args = parser.parse_args()
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='  %(message)s'
+    )
 
     main(args.host, args.port) 
\ No newline at end of file
@@ -1,15 +1,14 @@
 import ctypes
 from ctypes import (c_void_p, c_char_p, c_uint32, c_uint8, c_uint64, c_uint16,
-                   POINTER, Structure, c_int, c_size_t, cast, memset, sizeof, byref)
+                   POINTER, Structure, c_int, c_size_t, cast, memset, sizeof, byref,
+                   string_at)
 import argparse
+import threading
 import time
 
 # Load SIL-Kit shared library
 silkit = ctypes.CDLL('/home/frank/projects/sil-kit/build/Release/libSilKit.so')
 
-# Keep a global reference to the callback pointer to prevent garbage collection
-_global_frame_handler_ptr = None
-
 # Define SIL-Kit structs
 class SilKit_StructHeader(Structure):
     _fields_ = [
@@ -92,63 +91,68 @@ def SilKit_Struct_Init(struct_type, struct_instance):
     elif struct_type == SilKit_LifecycleConfiguration:
         struct_instance.structHeader.version = ((83 << 56) | (75 << 48) | (7 << 40) | (2 << 32) | (1 << 24))  # SK_ID_MAKE(Participant, SilKit_LifecycleConfiguration)
 
+# Python frame handlers, keyed by the address of the CAN controller they were added to
+_FRAME_HANDLERS = {}
+
+# Single module-level callback, created once at import; it stays referenced by the
+# module, so it cannot be garbage collected while SIL-Kit holds it
+@FrameHandlerType
+def _dispatch_can_frame(context, controller, frame_event):
+    handler = _FRAME_HANDLERS.get(controller)
+    if handler is not None:
+        handler(frame_event)
+
+def print_can_frame_event(frame_event):
+    # Access the CanFrame via the pointer
+    # Add a check for null pointer before accessing contents
+    if not frame_event:
+        print("Error: Received null frame_event pointer.")
+        return
+    if not frame_event.contents.frame:
+        print("Error: Received null frame pointer within frame_event.")
+        return
+
+    frame = frame_event.contents.frame.contents
+    print(f"\nReceived CAN frame:")
+    print(f"ID: {frame.id}")
+    print(f"Flags: {frame.flags}")
+    print(f"DLC: {frame.dlc}")
+    # Access data through the pointer structure
+    data_size = frame.data.size
+    if frame.data.data and data_size > 0:
+        # Copy the payload out with a single memcpy instead of indexing the pointer per byte
+        print(f"Data: {list(string_at(frame.data.data, data_size))}")
+    else:
+        print("Data: (empty or null)")
+    print(f"Timestamp: {frame_event.contents.timestamp}")
+    print(f"Direction: {frame_event.contents.direction}")
+
 # Function to receive a CAN frame
 def receive_can_frame(can_controller):
-    global _global_frame_handler_ptr # Declare we are using the global variable
-
-    # Create a frame handler callback function
-    def frame_handler(context, controller, frame_event):
-        # Access the CanFrame via the pointer
-        # Add a check for null pointer before accessing contents
-        if not frame_event:
-            print("Error: Received null frame_event pointer.")
-            return
-        if not frame_event.contents.frame:
-            print("Error: Received null frame pointer within frame_event.")
-            return
-
-        frame = frame_event.contents.frame.contents
-        print(f"\nReceived CAN frame:")
-        print(f"ID: {frame.id}")
-        print(f"Flags: {frame.flags}")
-        print(f"DLC: {frame.dlc}")
-        # Access data through the pointer structure
-        data_size = frame.data.size
-        if frame.data.data and data_size > 0:
-            print(f"Data: {[frame.data.data[i] for i in range(data_size)]}")
-        else:
-            print("Data: (empty or null)")
-        print(f"Timestamp: {frame_event.contents.timestamp}")
-        print(f"Direction: {frame_event.contents.direction}")
-
-    # Create a function pointer for the frame handler
-    # The callback signature expected by C: void(void* context, SilKit_CanController* controller, SilKit_CanFrameEvent* frameEvent)
-    # Our Python callback definition matches this order now.
-    frame_handler_ptr = FrameHandlerType(frame_handler)
-
-    # Store the pointer in a global variable to prevent garbage collection
-    _global_frame_handler_ptr = frame_handler_ptr
+    # SIL-Kit passes the controller handle back to the callback, route it to our handler
+    _FRAME_HANDLERS[can_controller.value] = print_can_frame_event
 
     # Add frame handler to CAN controller
     handler_id = c_uint32()
     result = silkit.SilKit_CanController_AddFrameHandler(
         can_controller,
         None,  # No user context needed
-        frame_handler_ptr,
+        _dispatch_can_frame,
         2,     # Direction RX (2 for receive)
         byref(handler_id)
     )
     if result != 0:
+        _FRAME_HANDLERS.pop(can_controller.value, None)
         print(f"Failed to add frame handler: {result}")
         return
 
     print(f"Frame handler added successfully with ID: {handler_id.value}")
     print("Waiting for CAN frames...")
 
-    # Keep the program running
+    # Keep the program running: frames are handled on SIL-Kit's thread, the main
+    # thread just blocks until Ctrl-C without waking up periodically
     try:
-        while True:
-            time.sleep(1)
+        threading.Event().wait()
     except KeyboardInterrupt:
         print("\nStopping receiver...")
 
@@ -239,34 +243,37 @@ def main():
         receive_can_frame(can_controller)
 
 def test_send_can_frame(can_controller):
+    # Create and initialize the CAN frame once, only the payload changes between sends
+    frame = CanFrame()
+    SilKit_Struct_Init(CanFrame, frame)
+
+    # Set CAN frame fields
+    frame.id = 0x123  # Example CAN ID
+    frame.flags = SILKIT_CANFRAMEFLAG_IDE  # Use extended ID format
+    frame.dlc = 8  # Data length code
+
+    # Payload buffer the frame points at for the whole run
+    data_buffer = (c_uint8 * 8)()
+    frame.data.data = cast(data_buffer, POINTER(c_uint8))
+    frame.data.size = 8
+    frame_ref = byref(frame)
+    send = silkit.SilKit_CanController_SendFrame
+
     try:
         while True:
-            # Create and initialize CAN frame
-            frame = CanFrame()
-            SilKit_Struct_Init(CanFrame, frame)
-
-            # Set CAN frame fields
-            frame.id = 0x123  # Example CAN ID
-            frame.flags = SILKIT_CANFRAMEFLAG_IDE  # Use extended ID format
-            frame.dlc = 8  # Data length code
-
             # Pack data into CAN message
-            data = bytearray(8)
-            data[0] = 1  # Example data
-            data[1] = 22  # Example data
-            data_buffer = (c_uint8 * 8)(*data)
-            frame.data.data = cast(data_buffer, POINTER(c_uint8))
-            frame.data.size = 8
+            data_buffer[0] = 1  # Example data
+            data_buffer[1] = 22  # Example data
 
             # Debugging: Print frame and data buffer contents
             print(f"CAN Frame ID: {frame.id}")
             print(f"CAN Frame Flags: {frame.flags}")
             print(f"CAN Frame DLC: {frame.dlc}")
-            print(f"CAN Frame Data: {[data_buffer[i] for i in range(frame.data.size)]}")
+            print(f"CAN Frame Data: {list(data_buffer)}")
 
             # Send frame
             print("Sending CAN frame...")
-            result = silkit.SilKit_CanController_SendFrame(can_controller, byref(frame), None)
+            result = send(can_controller, frame_ref, None)
             if result != 0:
                 print(f"Failed to send CAN frame: {result}")
 